@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: folder ScriptHub vs. SQLiteScriptHub at several hub sizes.
+
+Usage: python benchmarks/bench_hub_backends.py [--sizes 100,10000,100000] [--lookups 1000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from script_hub import ScriptHub  # noqa: E402
+from sqlite_hub import SQLiteScriptHub  # noqa: E402
+
+WORDS = (
+    "player humanoid speed jump fly esp teleport noclip aimbot camera "
+    "character walk gui notify toggle health tween render loop workspace"
+).split()
+
+BODY = '''local Players = game:GetService("Players")
+local player = Players.LocalPlayer
+-- {words}
+local function run()
+    local character = player.Character
+    if character then
+        print("{name} running")
+    end
+end
+run()
+'''
+
+
+def make_scripts(count, seed=0):
+    rng = random.Random(seed)
+    scripts = []
+    for i in range(count):
+        words = rng.sample(WORDS, 4)
+        name = f"{words[0].title()} {words[1].title()} {i}"
+        body = BODY.format(words=' '.join(rng.sample(WORDS, 8)), name=name)
+        scripts.append((name, body, f"{words[2]} {words[3]} helper"))
+    return scripts
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench_size(count, lookups):
+    scripts = make_scripts(count)
+    workdir = tempfile.mkdtemp(prefix='synapse-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)  # ScriptHub keeps its scripts in ./scripts
+    try:
+        results = {}
+
+        files = ScriptHub()
+        results['populate', 'files'], _ = timed(
+            lambda: [files.add_script(*script) for script in scripts]
+        )
+        results['populate', 'sqlite'], sqlite = timed(lambda: SQLiteScriptHub('hub.db'))
+
+        backends = {
+            'files': (lambda: ScriptHub(), files),
+            'sqlite': (lambda: SQLiteScriptHub('hub.db'), sqlite),
+        }
+        ids = [item['id'] for item in files.iter_scripts()]
+        sample = random.Random(1).choices(ids, k=lookups)
+
+        for backend, (reopen, hub) in backends.items():
+            results['open + list all', backend], _ = timed(lambda: sum(1 for _ in reopen().iter_scripts()))
+            results['first page', backend], _ = timed(lambda: list(islice(hub.iter_scripts(), 100)))
+            results[f'get x{lookups}', backend], _ = timed(lambda: [hub.get_script(i) for i in sample])
+            results['add x100', backend], _ = timed(
+                lambda: [hub.add_script(f"Bench Extra {i}", "print('extra')", "extra") for i in range(100)]
+            )
+            results['delete x100', backend], _ = timed(
+                lambda: [hub.delete_script(f"bench_extra_{i}.lua") for i in range(100)]
+            )
+
+        for backend, (_, hub) in backends.items():
+            # The folder hub builds its trigram index on the first search
+            results['first search', backend], _ = timed(lambda: hub.search_scripts('teleport'))
+            for query in ('teleport', 'noclip aimbot', f'{count - 1}'):
+                results[f'search "{query}"', backend], _ = timed(lambda: hub.search_scripts(query))
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,10000,100000')
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+
+    for count in (int(size) for size in args.sizes.split(',')):
+        results = bench_size(count, args.lookups)
+        print(f"Hub: {count} scripts")
+        for operation in dict.fromkeys(op for op, _ in results):
+            files = results[operation, 'files']
+            sqlite = results[operation, 'sqlite']
+            print(f"  {operation:22}: files {files * 1000:10.2f} ms   sqlite {sqlite * 1000:10.2f} ms"
+                  f"   ({files / sqlite:6.2f}x)")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-pass lua_lexer vs. the previous line-by-line checker.
+
+Usage: python benchmarks/bench_lexer.py [--lines 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lua_lexer import find_syntax_errors  # noqa: E402
+
+SNIPPET = '''-- Speed Boost Script
+local Player = game:GetService("Players").LocalPlayer
+local speedMultiplier = 2 -- Change this value to adjust speed
+--[[ Long comment with (unbalanced brackets
+     and an if without then
+]]
+local function setSpeed(multiplier)
+    local character = Player.Character
+    if character then
+        local humanoid = character:FindFirstChildOfClass("Humanoid")
+        if humanoid and humanoid.Health > 0 then
+            humanoid.WalkSpeed = 16 * (multiplier or speedMultiplier)
+            print("Speed set to: " .. humanoid.WalkSpeed .. " [x" .. multiplier .. "]")
+        end
+    end
+end
+local config = { speed = 2, keys = { "W", "A", "S", "D" }, label = [[boost (beta]] }
+game:GetService("StarterGui"):SetCore("SendNotification", {
+    Title = "Speed Boost";
+    Text = "Speed increased to " .. (16 * speedMultiplier) .. "!";
+    Duration = 5;
+})
+'''
+
+
+def legacy_check(script):
+    """The checker validate_lua_syntax used before lua_lexer."""
+    errors = []
+    lines = script.split('\n')
+    stack = []
+    pairs = {'(': ')', '[': ']', '{': '}'}
+    reverse_pairs = {')': '(', ']': '[', '}': '{'}
+
+    for line_num, line in enumerate(lines, 1):
+        clean_line = re.sub(r'--.*$', '', line)
+        for char in clean_line:
+            if char in pairs:
+                stack.append((char, line_num))
+            elif char in reverse_pairs:
+                if not stack or stack[-1][0] != reverse_pairs[char]:
+                    errors.append(f"Line {line_num}: Unmatched '{char}'")
+                    break
+                stack.pop()
+
+    if stack:
+        char, line_num = stack[-1]
+        errors.append(f"Line {line_num}: Unclosed '{char}'")
+
+    for line_num, line in enumerate(lines, 1):
+        clean_line = line.strip()
+        if clean_line.startswith('if ') and 'then' not in clean_line:
+            if line_num < len(lines) and 'then' not in lines[line_num].strip():
+                errors.append(f"Line {line_num}: 'if' statement missing 'then'")
+        if clean_line.startswith('function ') and not clean_line.endswith(')'):
+            if '(' in clean_line and ')' not in clean_line:
+                errors.append(f"Line {line_num}: Incomplete function definition")
+
+    return errors
+
+
+def make_script(target_lines):
+    snippet_lines = SNIPPET.count('\n')
+    return SNIPPET * max(1, target_lines // snippet_lines)
+
+
+def best_of(func, script, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(script)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    script = make_script(args.lines)
+    line_count = script.count('\n')
+
+    legacy = best_of(legacy_check, script, args.repeat)
+    lexer = best_of(find_syntax_errors, script, args.repeat)
+
+    print(f"Script: {line_count} lines, {len(script)} chars")
+    print(f"  legacy checker : {legacy * 1000:8.2f} ms  ({len(legacy_check(script))} false errors)")
+    print(f"  lua_lexer      : {lexer * 1000:8.2f} ms  ({len(find_syntax_errors(script))} errors)")
+    print(f"  speedup        : {legacy / lexer:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark suite for the validator, sandbox and Script Hub hot paths.
+
+Usage: python benchmarks/bench_suite.py [--quick] [--only PATTERN] [--save results.json]
+                                        [--baseline old.json] [--threshold 0.25] [--min-delta 0.1]
+
+Synthetic corpora are generated on the fly, so the suite runs offline:
+tiny, typical and 10k-line scripts, and folder hubs of 100, 10k and 100k
+scripts (100 and 1k with --quick). Each benchmark reports the best and
+median of several runs. With --baseline, any benchmark whose median is
+slower than the baseline's by more than --threshold is reported and the
+suite exits with status 1.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Everything runs in this process; nothing here needs to survive a crash
+os.environ.setdefault('SYNAPSE_SANDBOX_WORKERS', '0')
+os.environ.setdefault('SYNAPSE_HUB_FSYNC', '0')
+
+from bench_hub_backends import make_scripts  # noqa: E402
+from bench_lexer import SNIPPET  # noqa: E402
+
+# Each copy of the snippet gets its own block: Lua allows only 200 locals
+# per function, and the corpus has to run as well as parse
+BLOCK = 'do\n' + SNIPPET + 'end\n'
+SCRIPTS = {
+    'tiny': 'print("hi")\n',
+    'typical': SNIPPET,
+    '10k_lines': BLOCK * (10000 // BLOCK.count('\n')),
+}
+HUB_SIZES = (100, 10000, 100000)
+HUB_BENCHMARKS = (
+    'open', 'get_all_scripts/cold', 'get_all_scripts/warm', 'first_page',
+    'get_script_x100', 'search', 'add_script_x100',
+)
+QUICK_HUB_SIZES = (100, 1000)
+
+
+def measure(func, repeat, setup=None):
+    """Best and median seconds of repeat calls to func (setup() runs untimed first)."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times), 'runs': repeat}
+
+
+class Suite:
+    def __init__(self, only=None, repeat=5):
+        self.only = only
+        self.repeat = repeat
+        self.results = {}
+        self.skipped = {}
+
+    def wanted(self, name):
+        return self.only is None or fnmatch.fnmatch(name, self.only)
+
+    def bench(self, name, func, setup=None, repeat=None):
+        if not self.wanted(name):
+            return
+        result = measure(func, repeat or self.repeat, setup)
+        self.results[name] = result
+        print(f"  {name:40} best {result['best'] * 1000:10.3f} ms   median {result['median'] * 1000:10.3f} ms")
+
+    def skip(self, name, reason):
+        if self.wanted(name):
+            self.skipped[name] = reason
+            print(f"  {name:40} skipped: {reason}")
+
+
+def bench_validator(suite, executor):
+    print("Validator")
+    for label, script in SCRIPTS.items():
+        suite.bench(
+            f'validate/{label}/uncached',
+            lambda: executor.validate_lua_syntax(script),
+            setup=executor.validation_cache.clear,
+        )
+        executor.validate_lua_syntax(script)
+        suite.bench(f'validate/{label}/cached', lambda: executor.validate_lua_syntax(script))
+
+
+def bench_sandbox(suite, executor, available):
+    print("Sandbox")
+    for label, script in SCRIPTS.items():
+        name = f'test_script_locally/{label}'
+        if not available:
+            suite.skip(name, "lupa is not installed")
+            continue
+        suite.bench(name, lambda: executor.test_script_locally(script))
+
+
+def bench_hub(suite, size):
+    from script_hub import ScriptHub
+
+    prefix = f'hub/{size}'
+    if not any(suite.wanted(f'{prefix}/{name}') for name in HUB_BENCHMARKS):
+        return
+
+    print(f"Hub: {size} scripts")
+    workdir = tempfile.mkdtemp(prefix='synapse-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)  # ScriptHub keeps its scripts in ./scripts
+    try:
+        hub = ScriptHub()
+        hub.add_scripts(make_scripts(size))
+        ids = [item['id'] for item in hub.iter_scripts()]
+        sample = ids[::max(1, len(ids) // 100)][:100]
+        repeat = 3 if size >= 10000 else None
+
+        suite.bench(f'{prefix}/open', lambda: ScriptHub(), repeat=repeat)
+        fresh = []
+        suite.bench(
+            f'{prefix}/get_all_scripts/cold',
+            lambda: fresh[-1].get_all_scripts(),
+            setup=lambda: fresh.append(ScriptHub()),
+            repeat=repeat,
+        )
+        fresh.clear()
+        hub.get_all_scripts()
+        suite.bench(f'{prefix}/get_all_scripts/warm', hub.get_all_scripts, repeat=repeat)
+        suite.bench(f'{prefix}/first_page', lambda: list(islice(hub.iter_scripts(), 100)))
+        suite.bench(f'{prefix}/get_script_x100', lambda: [hub.get_script(i) for i in sample])
+        hub.search_scripts('teleport')  # builds the trigram index
+        suite.bench(f'{prefix}/search', lambda: hub.search_scripts('noclip aimbot'))
+        suite.bench(
+            f'{prefix}/add_script_x100',
+            lambda: [hub.add_script(f"Bench Extra {i}", "print('extra')", "extra") for i in range(100)],
+        )
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Print the change against a baseline; returns the regressed benchmark names.
+
+    A regression is a median slower by more than threshold (a fraction) and
+    by more than min_delta seconds, so timer noise on sub-millisecond
+    benchmarks does not fail the run.
+    """
+    regressions = []
+    print(f"\nCompared with baseline ({baseline['meta'].get('commit') or 'unknown commit'}):")
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None or not old['median']:
+            continue
+        ratio = result['median'] / old['median']
+        flag = ''
+        if ratio > 1 + threshold and result['median'] - old['median'] > min_delta:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"  {name:40} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="smaller hubs, for a fast check")
+    parser.add_argument('--only', help="run only benchmarks matching this glob, e.g. 'hub/*'")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown of a median before failing (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=0.1,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args()
+
+    import executor as executor_module
+    suite = Suite(args.only, args.repeat)
+    executor = executor_module.RobloxExecutor()
+    try:
+        bench_validator(suite, executor)
+        bench_sandbox(suite, executor, executor_module.LUA_AVAILABLE)
+    finally:
+        if executor.sandbox:
+            executor.sandbox.shutdown()
+    for size in (QUICK_HUB_SIZES if args.quick else HUB_SIZES):
+        bench_hub(suite, size)
+
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': args.quick,
+        },
+        'results': suite.results,
+        'skipped': suite.skipped,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(suite.results, baseline, args.threshold, args.min_delta / 1000)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}:")
+            for name in regressions:
+                print(f"  {name}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
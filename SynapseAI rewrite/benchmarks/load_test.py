@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Load test: requests per second and latency of one running instance.
+
+Usage: python benchmarks/load_test.py [--concurrency 1,8,32] [--duration 10]
+                                      [--mix scripts=4,script=2,search=1,test=2,execute=1]
+                                      [--hub-size 1000] [--serve]
+                                      [--url http://host:port]
+                                      [--save load.json]
+
+Unless --url is given, a fresh instance is started from main.py on a free
+local port, in a temporary directory holding a generated Script Hub of
+--hub-size scripts (under the waitress server with --serve). On Linux and
+macOS a stand-in "RobloxPlayer" process is started too and the instance
+injected into it, so /api/execute runs its full path instead of answering
+"Not injected".
+
+Each concurrency level runs that many client threads for --duration
+seconds, each replaying the weighted request mix over a keep-alive
+connection. Per level and request kind it reports throughput, p50/p95/p99
+latency, errors (HTTP status >= 400 or no response) and rejections
+(HTTP 200 with "success": false).
+
+Request kinds:
+
+    scripts   GET  /api/scripts             first page of the hub listing
+    script    GET  /api/scripts/<id>        one script's content
+    search    GET  /api/scripts/search?q=   hub search
+    test      POST /api/test                sandbox run of a sample script
+    execute   POST /api/execute             queue an execution job
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_hub_backends import WORDS, make_scripts  # noqa: E402
+from bench_lexer import SNIPPET  # noqa: E402
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+KINDS = ('scripts', 'script', 'search', 'test', 'execute')
+DEFAULT_MIX = 'scripts=4,script=2,search=1,test=2,execute=1'
+SAMPLE_SCRIPTS = ('print("hi")\n', SNIPPET)
+
+
+def parse_mix(text):
+    """'scripts=4,test=1' -> {'scripts': 4.0, 'test': 1.0}"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"unknown request kind {kind!r} (one of: {', '.join(KINDS)})")
+        try:
+            mix[kind] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {kind}: {weight!r}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Instance:
+    """An app started from main.py in a scratch directory with a generated hub"""
+
+    def __init__(self, hub_size, fake_roblox=True, serve=False):
+        self.serve = serve
+        self.workdir = tempfile.mkdtemp(prefix='synapse-load-')
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.server = None
+        self.roblox = None
+
+        cwd = os.getcwd()
+        os.chdir(self.workdir)  # ScriptHub keeps its scripts in ./scripts
+        try:
+            from script_hub import ScriptHub
+            ScriptHub().add_scripts(make_scripts(hub_size))
+        finally:
+            os.chdir(cwd)
+
+        sleep = shutil.which('sleep')
+        if fake_roblox and platform.system() in ('Linux', 'Darwin') and sleep:
+            # The executor looks for a process named RobloxPlayer
+            stand_in = os.path.join(self.workdir, 'RobloxPlayer')
+            os.symlink(sleep, stand_in)
+            self.roblox = subprocess.Popen([stand_in, '86400'])
+
+    def start(self, timeout=30):
+        env = dict(os.environ, SYNAPSE_HUB_BACKEND='files', PYTHONUNBUFFERED='1')
+        self.log = open(os.path.join(self.workdir, 'server.log'), 'wb')
+        command = [sys.executable, os.path.join(APP_DIR, 'main.py'), '--port', str(self.port), '--no-browser']
+        if self.serve:
+            command.append('--serve')
+        self.server = subprocess.Popen(
+            command, cwd=self.workdir, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.server.poll() is not None:
+                raise RuntimeError(f"the server exited with status {self.server.returncode}; "
+                                   f"see {self.log.name}")
+            try:
+                status, _ = request(self.url, 'GET', '/api/status')
+                if status == 200:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.2)
+        else:
+            raise RuntimeError(f"the server did not answer within {timeout}s; see {self.log.name}")
+
+        if self.roblox is not None:
+            _, body = request(self.url, 'POST', '/api/inject')
+            if not body.get('success'):
+                print(f"Could not inject, /api/execute will be rejected: {body.get('message')}")
+
+    def stop(self):
+        for proc in (self.server, self.roblox):
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+                try:
+                    proc.wait(10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        if self.server is not None:
+            self.log.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def request(base_url, method, path, payload=None, conn=None):
+    """One request; returns (status, decoded JSON body or {})"""
+    own = conn is None
+    if own:
+        parts = urlsplit(base_url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    try:
+        body = headers = None
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            headers = {'Content-Type': 'application/json'}
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        data = response.read()
+        try:
+            decoded = json.loads(data) if data else {}
+        except ValueError:
+            decoded = {}
+        return response.status, decoded if isinstance(decoded, dict) else {}
+    finally:
+        if own:
+            conn.close()
+
+
+class Workload:
+    """Builds requests of each kind from the target's own hub"""
+
+    def __init__(self, base_url):
+        ids = []
+        cursor = None
+        while len(ids) < 1000:
+            path = '/api/scripts?limit=200' + (f'&cursor={quote(cursor)}' if cursor else '')
+            _, body = request(base_url, 'GET', path)
+            ids.extend(item['id'] for item in body.get('scripts', []))
+            cursor = body.get('next_cursor')
+            if not cursor:
+                break
+        self.ids = ids
+        # Executions also send a few hub bodies; those index the mock
+        # LocalPlayer, which is nil, so sandbox tests stick to the samples
+        self.scripts = list(SAMPLE_SCRIPTS)
+        for script_id in ids[:8]:
+            _, body = request(base_url, 'GET', f'/api/scripts/{quote(script_id)}')
+            if body.get('content'):
+                self.scripts.append(body['content'])
+
+    def build(self, kind, rng):
+        """(method, path, payload) for one request of this kind"""
+        if kind == 'scripts':
+            return 'GET', '/api/scripts', None
+        if kind == 'script':
+            script_id = rng.choice(self.ids) if self.ids else 'missing'
+            return 'GET', f'/api/scripts/{quote(script_id)}', None
+        if kind == 'search':
+            return 'GET', '/api/scripts/search?q=' + quote(' '.join(rng.sample(WORDS, 2))), None
+        if kind == 'test':
+            return 'POST', '/api/test', {'script': rng.choice(SAMPLE_SCRIPTS)}
+        return 'POST', '/api/execute', {'script': rng.choice(self.scripts)}
+
+
+def run_level(base_url, workload, mix, concurrency, duration, seed):
+    """Run concurrency clients for duration seconds; returns per-kind samples"""
+    kinds = [kind for kind, weight in mix.items() if weight > 0]
+    weights = [mix[kind] for kind in kinds]
+    parts = urlsplit(base_url)
+    results = {kind: {'latencies': [], 'errors': 0, 'rejected': 0} for kind in kinds}
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency + 1)
+    stop_at = [0.0]
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        local = {kind: {'latencies': [], 'errors': 0, 'rejected': 0} for kind in kinds}
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        start.wait()
+        while time.perf_counter() < stop_at[0]:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, payload = workload.build(kind, rng)
+            began = time.perf_counter()
+            try:
+                status, body = request(base_url, method, path, payload, conn)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                status, body = None, {}
+            elapsed = time.perf_counter() - began
+            sample = local[kind]
+            sample['latencies'].append(elapsed)
+            if status is None or status >= 400:
+                sample['errors'] += 1
+            elif body.get('success') is False:
+                sample['rejected'] += 1
+        conn.close()
+        with lock:
+            for kind, sample in local.items():
+                results[kind]['latencies'].extend(sample['latencies'])
+                results[kind]['errors'] += sample['errors']
+                results[kind]['rejected'] += sample['rejected']
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    stop_at[0] = time.perf_counter() + duration
+    began = time.perf_counter()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    return summarize(results, time.perf_counter() - began)
+
+
+def summarize(results, elapsed):
+    summary = {}
+    totals = {'latencies': [], 'errors': 0, 'rejected': 0}
+    for kind, sample in list(results.items()) + [('all', totals)]:
+        if kind != 'all':
+            totals['latencies'].extend(sample['latencies'])
+            totals['errors'] += sample['errors']
+            totals['rejected'] += sample['rejected']
+        latencies = sorted(sample['latencies'])
+        count = len(latencies)
+        summary[kind] = {
+            'requests': count,
+            'rps': count / elapsed if elapsed else 0.0,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'errors': sample['errors'],
+            'error_rate': sample['errors'] / count if count else 0.0,
+            'rejected': sample['rejected'],
+        }
+    return summary
+
+
+def print_level(concurrency, summary):
+    print(f"\nConcurrency {concurrency}")
+    print(f"  {'kind':10} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+          f" {'errors':>8} {'rejected':>9}")
+    for kind, row in summary.items():
+        print(f"  {kind:10} {row['requests']:9d} {row['rps']:9.1f} {row['p50'] * 1000:9.2f}"
+              f" {row['p95'] * 1000:9.2f} {row['p99'] * 1000:9.2f} {row['error_rate']:7.1%}"
+              f" {row['rejected']:9d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,8,32',
+                        help="comma-separated client counts, one run each (default: 1,8,32)")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"weighted request kinds (default: {DEFAULT_MIX})")
+    parser.add_argument('--hub-size', type=int, default=1000, help="scripts in the generated hub")
+    parser.add_argument('--serve', action='store_true',
+                        help="start the instance on the waitress server (main.py --serve)")
+    parser.add_argument('--url', help="load an already running instance instead of starting one")
+    parser.add_argument('--no-roblox', action='store_true',
+                        help="don't start a stand-in Roblox process (execute is then rejected)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help="write the results to this JSON file")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    instance = None
+    base_url = args.url.rstrip('/') if args.url else None
+    try:
+        if base_url is None:
+            print(f"Starting an instance with a {args.hub_size}-script hub...")
+            instance = Instance(args.hub_size, fake_roblox=not args.no_roblox, serve=args.serve)
+            instance.start()
+            base_url = instance.url
+        print(f"Target: {base_url}")
+        workload = Workload(base_url)
+        mix = ', '.join(f'{kind}={weight:g}' for kind, weight in args.mix.items())
+        print(f"Mix: {mix}; {args.duration:g}s per level")
+
+        levels_report = {}
+        for concurrency in levels:
+            summary = run_level(base_url, workload, args.mix, concurrency, args.duration, args.seed)
+            levels_report[str(concurrency)] = summary
+            print_level(concurrency, summary)
+    finally:
+        if instance is not None:
+            instance.stop()
+
+    if args.save:
+        report = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'target': args.url or ('local --serve' if args.serve else 'local'),
+                'hub_size': None if args.url else args.hub_size,
+                'duration': args.duration,
+                'mix': args.mix,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            },
+            'levels': levels_report,
+        }
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
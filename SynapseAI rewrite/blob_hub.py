@@ -0,0 +1,311 @@
+"""
+Content-addressed Script Hub storage (SYNAPSE_HUB_BACKEND=blobs).
+
+Each script body is stored once, zlib-compressed, as blobs/<ab>/<sha256>.z,
+and each script is a small <id>.json holding its name, description and the
+hash of its body. Saving a body the store already holds only writes the
+metadata, and the content cache is keyed by hash so copies share one entry.
+Listing, paging and search come from ScriptHub.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+import zlib
+from collections import Counter
+
+import config
+import metrics
+from script_hub import (
+    GROUP_SYNC_MIN, TEMP_SUFFIX, ScriptHub, _IndexEntry, _clean_metadata, _signature, _sync_dir, _sync_file,
+    _write_file,
+)
+
+BLOB_SUFFIX = '.z'
+
+
+def _write_bytes(path, data, sync):
+    with open(path, 'wb') as f:
+        f.write(data)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def content_hash(content):
+    """Blob name of a script body"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class BlobScriptHub(ScriptHub):
+    def __init__(self, store_dir=None):
+        # Index entries keep their body's hash in lua_sig; _blob_refs counts
+        # the scripts pointing at each blob so unreferenced ones can go
+        self._blob_refs = Counter()
+        self._blob_sizes = {}  # hash -> compressed bytes on disk
+        self._blob_bytes = 0
+        # Blob writes and removals must not interleave, so writes are serialised
+        self._write_lock = threading.Lock()
+        super().__init__(store_dir or config.HUB_BLOB_DIR)
+
+    @property
+    def blobs_dir(self):
+        return os.path.join(self.scripts_dir, 'blobs')
+
+    def _blob_path(self, blob):
+        return os.path.join(self.blobs_dir, blob[:2], blob + BLOB_SUFFIX)
+
+    def ensure_scripts_directory(self):
+        """Ensure the store and its blobs directory exist"""
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+    def recover(self):
+        """Remove leftovers of interrupted saves, including unreferenced blobs"""
+        super().recover()
+        with self._index_lock:
+            self._scan()
+
+        for shard in os.listdir(self.blobs_dir):
+            shard_dir = os.path.join(self.blobs_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            with os.scandir(shard_dir) as entries:
+                for dir_entry in entries:
+                    blob = dir_entry.name[:-len(BLOB_SUFFIX)]
+                    if dir_entry.name.endswith(BLOB_SUFFIX) and blob in self._blob_refs:
+                        self._blob_sizes[blob] = dir_entry.stat().st_size
+                        self._blob_bytes += self._blob_sizes[blob]
+                        continue
+                    # A save that crashed after writing its blob but before
+                    # its metadata, or a temp file
+                    try:
+                        os.remove(dir_entry.path)
+                    except OSError:
+                        pass
+
+    def load_default_scripts(self):
+        """Import the scripts/ folder (and its defaults) into an empty store"""
+        if not self._index:
+            self.import_scripts(ScriptHub())
+
+    def import_scripts(self, source):
+        """One-shot import from another hub; returns scripts imported"""
+        records = []
+        for item in source.iter_scripts():
+            content = source.get_script_content(item['id'])
+            if content is not None:
+                records.append((item['id'], item['name'], item['description'], content))
+
+        self.put_scripts(records)
+        return len(records)
+
+    def _point(self, entry, blob):
+        """Repoint an index entry at a blob; returns the blob it left"""
+        old = entry.lua_sig
+        if old == blob:
+            return None
+        if blob is not None:
+            self._blob_refs[blob] += 1
+        if old is not None:
+            self._blob_refs[old] -= 1
+            if self._blob_refs[old] <= 0:
+                del self._blob_refs[old]
+        entry.lua_sig = blob
+        return old
+
+    def _scan_dir(self):
+        """Bring the index up to date from the metadata files' stat data"""
+        meta_stats = {}
+        with os.scandir(self.scripts_dir) as entries:
+            for dir_entry in entries:
+                if dir_entry.name.endswith('.json') and not dir_entry.name.startswith('.'):
+                    meta_stats[dir_entry.name[:-5] + '.lua'] = dir_entry.stat()
+
+        changed = False
+        for filename in self._index.keys() - meta_stats.keys():
+            self._point(self._index.pop(filename), None)
+            self._search_pending.add(filename)
+            changed = True
+
+        for filename, meta_stat in meta_stats.items():
+            meta_sig = _signature(meta_stat)
+            entry = self._index.get(filename)
+            if entry is not None and entry.meta_sig == meta_sig:
+                continue
+            try:
+                meta_path = os.path.join(self.scripts_dir, filename[:-4] + '.json')
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                record = None
+            blob = record.pop('blob', None) if isinstance(record, dict) else None
+            if not isinstance(blob, str):
+                # Not a script of this store
+                if entry is not None:
+                    self._point(self._index.pop(filename), None)
+                    self._search_pending.add(filename)
+                    changed = True
+                continue
+
+            if entry is None:
+                entry = self._index[filename] = _IndexEntry()
+            entry.meta_sig, entry.metadata = meta_sig, _clean_metadata(record)
+            self._point(entry, blob)
+            self._search_pending.add(filename)
+            changed = True
+
+        if changed:
+            self._changed()
+
+    def get_script_content(self, script_id):
+        """Read a script's body from its blob, served from the LRU cache if possible"""
+        with self._index_lock:
+            entry = self._index.get(script_id + '.lua')
+            blob = entry.lua_sig if entry is not None else None
+        if blob is None:
+            return None
+
+        content = self._content_cache.get(blob)
+        if content is not None:
+            return content
+        try:
+            with metrics.phase('hub_read'):
+                with open(self._blob_path(blob), 'rb') as f:
+                    content = zlib.decompress(f.read()).decode('utf-8')
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+        self._content_cache.put(blob, content)
+        return content
+
+    def put_scripts(self, records):
+        """Write (script_id, name, description, content) records as one batch
+
+        New blobs are written and renamed into place before the metadata
+        that points at them, so every script on disk is complete even if a
+        crash stops the batch half way. Bodies already stored are not
+        written again.
+        """
+        staged = {}  # filename -> (content, blob, metadata); the last save of a name wins
+        for script_id, name, description, content in records:
+            staged[script_id + '.lua'] = (content, content_hash(content), {'name': name, 'description': description})
+        if not staged:
+            return True
+
+        sync = config.HUB_FSYNC
+        group_sync = sync and len(staged) >= GROUP_SYNC_MIN
+        token = uuid.uuid4().hex
+        with self._write_lock:
+            new_blobs = {}  # blob -> compressed size
+            blob_renames = []
+            meta_renames = []
+            try:
+                for content, blob, _ in staged.values():
+                    path = self._blob_path(blob)
+                    if blob in new_blobs or os.path.exists(path):
+                        continue
+                    data = zlib.compress(content.encode('utf-8'), config.HUB_BLOB_LEVEL)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    temp = f"{path}.{token}{TEMP_SUFFIX}"
+                    blob_renames.append((temp, path))
+                    _write_bytes(temp, data, sync and not group_sync)
+                    new_blobs[blob] = len(data)
+
+                for filename, (_, blob, metadata) in staged.items():
+                    meta_filename = filename[:-4] + '.json'
+                    temp = os.path.join(self.scripts_dir, f".{meta_filename}.{token}{TEMP_SUFFIX}")
+                    meta_renames.append((temp, os.path.join(self.scripts_dir, meta_filename)))
+                    _write_file(temp, json.dumps(dict(metadata, blob=blob), indent=4), sync and not group_sync)
+                if group_sync:
+                    for temp, _ in blob_renames + meta_renames:
+                        _sync_file(temp)
+            except BaseException:
+                for temp, _ in blob_renames + meta_renames:
+                    try:
+                        os.remove(temp)
+                    except OSError:
+                        pass
+                raise
+
+            for temp, final in blob_renames:
+                os.replace(temp, final)
+            if sync:
+                for shard_dir in {os.path.dirname(final) for _, final in blob_renames}:
+                    _sync_dir(shard_dir)
+            for temp, final in meta_renames:
+                os.replace(temp, final)
+            if sync:
+                _sync_dir(self.scripts_dir)
+
+            # Large batches leave the search index to catch up on the next search
+            search_now = len(staged) < GROUP_SYNC_MIN
+            left = set()
+            with self._index_lock:
+                for blob, size in new_blobs.items():
+                    self._blob_sizes[blob] = size
+                    self._blob_bytes += size
+                for filename, (_, blob, metadata) in staged.items():
+                    try:
+                        meta_sig = _signature(os.stat(os.path.join(self.scripts_dir, filename[:-4] + '.json')))
+                    except OSError:
+                        # Let the next scan pick it up from disk
+                        self._scanned_at = None
+                        continue
+                    entry = self._index.get(filename)
+                    if entry is None:
+                        entry = self._index[filename] = _IndexEntry()
+                    entry.meta_sig, entry.metadata = meta_sig, metadata
+                    left.add(self._point(entry, blob))
+                    if search_now:
+                        self._search_pending.discard(filename)
+                    else:
+                        self._search_pending.add(filename)
+                self._changed()
+                unreferenced = [blob for blob in left if blob is not None and blob not in self._blob_refs]
+
+            for filename, (content, blob, metadata) in staged.items():
+                self._content_cache.put(blob, content)
+                if search_now:
+                    self._search_index.update(filename[:-4], metadata['name'], metadata['description'], content)
+            for blob in unreferenced:
+                self._remove_blob(blob)
+        return True
+
+    def delete_script(self, filename):
+        """Delete a script from the hub, and its blob if no other script shares it"""
+        meta_path = os.path.join(self.scripts_dir, filename[:-4] + '.json')
+        try:
+            with self._write_lock:
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+                with self._index_lock:
+                    entry = self._index.pop(filename, None)
+                    blob = None
+                    if entry is not None:
+                        blob = self._point(entry, None)
+                        self._changed()
+                    self._search_pending.discard(filename)
+                    unreferenced = blob is not None and blob not in self._blob_refs
+                self._search_index.remove(filename[:-4])
+                if unreferenced:
+                    self._remove_blob(blob)
+            return True
+        except Exception as e:
+            print(f"Error deleting script: {e}")
+            return False
+
+    def _remove_blob(self, blob):
+        self._content_cache.pop(blob)
+        try:
+            os.remove(self._blob_path(blob))
+        except OSError:
+            pass
+        with self._index_lock:
+            self._blob_bytes -= self._blob_sizes.pop(blob, 0)
+
+    def stats(self):
+        stats = super().stats()
+        with self._index_lock:
+            stats.update(backend='blobs', blobs=len(self._blob_refs), blob_bytes=self._blob_bytes)
+        return stats
@@ -0,0 +1,139 @@
+"""
+Runtime configuration for SynapseAI.
+
+Every tunable is read from a ``SYNAPSE_*`` environment variable so the
+executor, the web server and the macOS launcher all pick up the same values
+without extra command-line plumbing.
+"""
+
+import os
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment, falling back to default."""
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Ignoring invalid value for {name}: {value!r}")
+        return default
+
+
+def env_float(name, default):
+    """Read a float setting from the environment, falling back to default."""
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Ignoring invalid value for {name}: {value!r}")
+        return default
+
+
+def env_bool(name, default):
+    """Read a boolean setting (1/0, true/false, yes/no, on/off)."""
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Local Lua sandbox (test_script_locally)
+LUA_POOL_SIZE = env_int('SYNAPSE_LUA_POOL_SIZE', 4)
+LUA_POOL_PREWARM = env_int('SYNAPSE_LUA_POOL_PREWARM', 2)
+LUA_POOL_MAX_USES = env_int('SYNAPSE_LUA_POOL_MAX_USES', 50)
+
+# Worker processes that run local tests (0 = run on the request thread)
+SANDBOX_WORKERS = env_int('SYNAPSE_SANDBOX_WORKERS', min(4, os.cpu_count() or 1))
+SANDBOX_TIMEOUT = env_float('SYNAPSE_SANDBOX_TIMEOUT', 10.0)
+
+# Per-run budgets enforced inside the Lua runtime (the timeout above is the
+# backstop for anything they cannot interrupt)
+SANDBOX_MAX_INSTRUCTIONS = env_int('SYNAPSE_SANDBOX_MAX_INSTRUCTIONS', 100_000_000)
+SANDBOX_MAX_SECONDS = env_float('SYNAPSE_SANDBOX_MAX_SECONDS', 5.0)
+
+# Console output kept per run (characters); older lines are dropped
+SANDBOX_OUTPUT_LIMIT = env_int('SYNAPSE_SANDBOX_OUTPUT_LIMIT', 1_000_000)
+
+# Background execution jobs (/api/execute, /api/jobs/<id>)
+JOB_WORKERS = env_int('SYNAPSE_JOB_WORKERS', 2)
+JOB_QUEUE_MAX = env_int('SYNAPSE_JOB_QUEUE_MAX', 1000)
+JOB_RETENTION = env_float('SYNAPSE_JOB_RETENTION', 300.0)
+
+# Shared status monitor (/api/status, /api/status/stream)
+STATUS_INTERVAL = env_float('SYNAPSE_STATUS_INTERVAL', 2.0)
+STATUS_KEEPALIVE = env_float('SYNAPSE_STATUS_KEEPALIVE', 15.0)
+# Seconds before a status stream ends; EventSource reconnects on its own
+STATUS_STREAM_SECONDS = env_float('SYNAPSE_STATUS_STREAM_SECONDS', 300.0)
+
+# Process list and Roblox process info reuse (seconds)
+PROCESS_CACHE_TTL = env_float('SYNAPSE_PROCESS_CACHE_TTL', 1.0)
+
+# Script Hub storage: 'files' (scripts/ folder), 'sqlite' (HUB_DB_PATH) or
+# 'blobs' (compressed, deduplicated bodies under HUB_BLOB_DIR)
+HUB_BACKEND = os.environ.get('SYNAPSE_HUB_BACKEND', 'files').strip().lower()
+HUB_DB_PATH = os.environ.get('SYNAPSE_HUB_DB', 'hub.db')
+HUB_BLOB_DIR = os.environ.get('SYNAPSE_HUB_BLOB_DIR', 'hub_store')
+# zlib level for script bodies in the blob store (1-9)
+HUB_BLOB_LEVEL = env_int('SYNAPSE_HUB_BLOB_LEVEL', 6)
+
+# Script Hub index and listing (/api/scripts)
+HUB_SCAN_INTERVAL = env_float('SYNAPSE_HUB_SCAN_INTERVAL', 1.0)
+HUB_CONTENT_CACHE_BYTES = env_int('SYNAPSE_HUB_CONTENT_CACHE_BYTES', 8 * 1024 * 1024)
+HUB_PAGE_SIZE = env_int('SYNAPSE_HUB_PAGE_SIZE', 100)
+HUB_PAGE_MAX = env_int('SYNAPSE_HUB_PAGE_MAX', 1000)
+# fsync saved scripts before reporting success (off trades durability for speed)
+HUB_FSYNC = env_bool('SYNAPSE_HUB_FSYNC', True)
+# Scripts written per batch by /api/hub/import
+HUB_IMPORT_BATCH = env_int('SYNAPSE_HUB_IMPORT_BATCH', 500)
+
+# Execution log (logs/execution_log.txt), written by a background thread
+LOG_FLUSH_INTERVAL = env_float('SYNAPSE_LOG_FLUSH_INTERVAL', 1.0)
+LOG_QUEUE_MAX = env_int('SYNAPSE_LOG_QUEUE_MAX', 10000)
+# Rotate the live log past this size or age; rotated segments are gzipped
+LOG_MAX_BYTES = env_int('SYNAPSE_LOG_MAX_BYTES', 10 * 1024 * 1024)
+LOG_MAX_AGE = env_float('SYNAPSE_LOG_MAX_AGE', 24 * 3600.0)
+# Compressed segments kept, by count and by age (seconds)
+LOG_KEEP = env_int('SYNAPSE_LOG_KEEP', 10)
+LOG_RETENTION = env_float('SYNAPSE_LOG_RETENTION', 30 * 24 * 3600.0)
+
+# Execution history (logs/history.jsonl, /api/history)
+HISTORY_PAGE_SIZE = env_int('SYNAPSE_HISTORY_PAGE_SIZE', 50)
+HISTORY_PAGE_MAX = env_int('SYNAPSE_HISTORY_PAGE_MAX', 1000)
+
+# Request and phase metrics (/api/metrics)
+METRICS_ENABLED = env_bool('SYNAPSE_METRICS', True)
+
+# Profiling (/api/profile): '' (off), 'sample' or 'cprofile' from startup
+PROFILE_MODE = os.environ.get('SYNAPSE_PROFILE', '').strip().lower()
+# Fraction of requests run under cProfile in 'cprofile' mode
+PROFILE_FRACTION = env_float('SYNAPSE_PROFILE_FRACTION', 0.1)
+# Seconds between stack samples in 'sample' mode
+PROFILE_INTERVAL = env_float('SYNAPSE_PROFILE_INTERVAL', 0.005)
+# Stop a startup session after this many seconds (0 = run until shutdown)
+PROFILE_SECONDS = env_float('SYNAPSE_PROFILE_SECONDS', 0.0)
+
+# Response compression (gzip level 1-9)
+HTTP_GZIP_LEVEL = env_int('SYNAPSE_HTTP_GZIP_LEVEL', 6)
+
+# Syntax validation result cache (bytes of keys + messages)
+VALIDATION_CACHE_MAX_BYTES = env_int('SYNAPSE_VALIDATION_CACHE_BYTES', 4 * 1024 * 1024)
+
+# As-you-type validation sessions (/api/validate)
+VALIDATION_SESSIONS_MAX = env_int('SYNAPSE_VALIDATION_SESSIONS', 256)
+VALIDATION_SESSION_TTL = env_float('SYNAPSE_VALIDATION_SESSION_TTL', 600.0)
+
+# Production server (python main.py --serve)
+SERVE_THREADS = env_int('SYNAPSE_SERVE_THREADS', 16)
+SERVE_BACKLOG = env_int('SYNAPSE_SERVE_BACKLOG', 1024)
+SERVE_CONNECTION_LIMIT = env_int('SYNAPSE_SERVE_CONNECTION_LIMIT', 256)
+# Status streams and job long-polls open at once (0 = half the threads);
+# past this, streams get 503 and clients poll instead
+SERVE_STREAM_SLOTS = env_int('SYNAPSE_SERVE_STREAM_SLOTS', 0)
+# Seconds an idle keep-alive connection is kept open
+SERVE_KEEPALIVE = env_float('SYNAPSE_SERVE_KEEPALIVE', 120.0)
+# Seconds a shutdown waits for sandbox runs, jobs and requests in progress
+SHUTDOWN_TIMEOUT = env_float('SYNAPSE_SHUTDOWN_TIMEOUT', 30.0)
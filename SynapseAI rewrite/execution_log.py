@@ -0,0 +1,259 @@
+"""
+Execution log with a background writer and rotation.
+
+RobloxExecutor.log_execution() only formats the entry and appends it to an
+in-memory queue; one writer thread drains the queue, writes whole batches to
+logs/execution_log.txt and flushes at most once per interval. When the file
+grows past its size limit or gets too old it is renamed to a timestamped
+segment and gzip-compressed, and old segments are deleted to stay within
+the retention limits. The live log's start time is kept in a small sidecar
+file (filesystems do not record when a file was created), and a rotation
+cut short by a crash is finished on the next start. An execute never waits
+for log I/O: when the queue is full, the entry is dropped and counted
+instead.
+"""
+
+import gzip
+import os
+import shutil
+import threading
+import time
+from collections import deque
+
+import config
+import metrics
+
+SEGMENT_PREFIX = 'execution_log-'
+SEGMENT_SUFFIX = '.txt.gz'
+
+# Seconds before a failed rotation (a full disk, say) is tried again
+ROTATE_RETRY = 60.0
+
+
+class ExecutionLog:
+    """Queue-backed, rotating log file.
+
+    log_dir         -- folder holding the live log and its segments
+    filename        -- name of the live log in log_dir
+    rotate          -- False keeps one ever-growing file (no segments)
+    flush_interval  -- seconds between flushes of the live log
+    max_bytes       -- live log size that triggers a rotation
+    max_age         -- seconds after which the live log is rotated
+    keep            -- compressed segments kept
+    retention       -- seconds a compressed segment is kept
+    max_pending     -- entries queued before new ones are dropped
+    """
+
+    def __init__(self, log_dir="logs", filename="execution_log.txt", rotate=True, flush_interval=None,
+                 max_bytes=None, max_age=None, keep=None, retention=None, max_pending=None):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, filename)
+        self.started_path = self.path + '.started'
+        self.rotate = rotate
+        self.flush_interval = flush_interval or config.LOG_FLUSH_INTERVAL
+        self.max_bytes = max_bytes or config.LOG_MAX_BYTES
+        self.max_age = max_age or config.LOG_MAX_AGE
+        self.keep = keep if keep is not None else config.LOG_KEEP
+        self.retention = retention or config.LOG_RETENTION
+        self.max_pending = max_pending or config.LOG_QUEUE_MAX
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._started = False
+        self._stopped = False
+        self._file = None
+        self._opened_at = None
+        self._recovered = False
+        self._rotate_retry_at = 0.0
+        self._stats = {'written': 0, 'dropped': 0, 'flushes': 0, 'rotations': 0, 'errors': 0}
+
+    def start(self):
+        """Start the writer thread (done lazily on the first entry)."""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="synapse-execution-log", daemon=True).start()
+
+    def write(self, text):
+        """Queue text for the log; never blocks on disk."""
+        self.start()
+        with self._cond:
+            if self._closed or len(self._pending) >= self.max_pending:
+                self._stats['dropped'] += 1
+                return False
+            self._pending.append(text)
+            self._cond.notify()
+        return True
+
+    def close(self, timeout=5.0):
+        """Write out everything queued and stop the writer."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            if self._started:
+                self._cond.wait_for(lambda: self._stopped, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._closed:
+                    # Let entries pile up for one interval (or until the queue
+                    # is half full), then write them together
+                    self._cond.wait_for(
+                        lambda: self._closed or len(self._pending) >= self.max_pending // 2,
+                        self.flush_interval
+                    )
+                batch = list(self._pending)
+                self._pending.clear()
+                closing = self._closed
+
+            try:
+                if batch:
+                    self._append(batch)
+            except Exception as e:
+                print(f"Failed to log execution: {e}")
+                with self._cond:
+                    self._stats['errors'] += 1
+
+            if closing:
+                with self._cond:
+                    if not self._pending:
+                        self._close_file()
+                        self._stopped = True
+                        self._cond.notify_all()
+                        return
+
+    def _append(self, batch):
+        with metrics.phase('log_write'):
+            self._write_batch(batch)
+        with self._cond:
+            self._stats['written'] += len(batch)
+            self._stats['flushes'] += 1
+
+    def _write_batch(self, batch):
+        if self._file is None:
+            self._open()
+        elif self.rotate and time.monotonic() >= self._rotate_retry_at and (
+            self._file.tell() >= self.max_bytes or time.time() - self._opened_at >= self.max_age
+        ):
+            try:
+                self._rotate()
+            except OSError as e:
+                # The entries stay in the live log or the .rotating file,
+                # which the next rotation compresses first
+                print(f"Failed to rotate the execution log: {e}")
+                with self._cond:
+                    self._stats['errors'] += 1
+                self._rotate_retry_at = time.monotonic() + ROTATE_RETRY
+            self._open()
+
+        self._file.write(''.join(batch))
+        self._file.flush()
+
+    def _open(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        if self.rotate and not self._recovered:
+            self._recovered = True
+            self._recover()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if not self.rotate:
+            return
+        # An existing log keeps aging from when it was started
+        started = self._read_started() if self._file.tell() else None
+        if started is None:
+            started = time.time()
+            self._write_started(started)
+        self._opened_at = started
+
+    def _read_started(self):
+        try:
+            with open(self.started_path, encoding='utf-8') as f:
+                return float(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _write_started(self, started):
+        tmp = self.started_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(f"{started:.3f}\n")
+        os.replace(tmp, self.started_path)
+
+    def _recover(self):
+        """Finish a rotation interrupted by a crash so its entries are not lost."""
+        rotated = self.path + '.rotating'
+        for name in os.listdir(self.log_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX + '.tmp'):
+                # A half-written segment; its source is still in the .rotating file
+                try:
+                    os.remove(os.path.join(self.log_dir, name))
+                except OSError:
+                    pass
+        if not os.path.exists(rotated):
+            return
+        try:
+            self._compress(rotated, os.path.getmtime(rotated))
+        except OSError as e:
+            print(f"Failed to recover {rotated}: {e}")
+            with self._cond:
+                self._stats['errors'] += 1
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        """Compress the live log into a segment and apply the retention limits."""
+        self._close_file()
+        rotated = self.path + '.rotating'
+        if os.path.exists(rotated):
+            # Left by a rotation that failed earlier: compress it rather
+            # than replace it
+            self._compress(rotated, os.path.getmtime(rotated))
+        os.replace(self.path, rotated)
+        self._compress(rotated, time.time())
+        with self._cond:
+            self._stats['rotations'] += 1
+        self._prune()
+
+    def _compress(self, rotated, when):
+        """gzip rotated into a segment stamped with when, then remove it."""
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(when)) + f".{int(when * 1000) % 1000:03d}"
+        segment = os.path.join(self.log_dir, SEGMENT_PREFIX + stamp + SEGMENT_SUFFIX)
+        if os.path.exists(segment):
+            segment = segment[:-len(SEGMENT_SUFFIX)] + f"-{os.getpid()}" + SEGMENT_SUFFIX
+        try:
+            with open(rotated, 'rb') as source, gzip.open(segment + '.tmp', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.replace(segment + '.tmp', segment)
+        except OSError:
+            try:
+                os.remove(segment + '.tmp')
+            except OSError:
+                pass
+            raise
+        os.remove(rotated)
+
+    def _prune(self):
+        segments = sorted(
+            name for name in os.listdir(self.log_dir)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        now = time.time()
+        for index, name in enumerate(segments):
+            path = os.path.join(self.log_dir, name)
+            try:
+                # Oldest first: drop the surplus, then anything past retention
+                if index < len(segments) - self.keep or now - os.path.getmtime(path) > self.retention:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        return stats
@@ -1,9 +1,8 @@
 import subprocess
 import platform
-import psutil
 import time
-import os
 import re
+import hashlib
 #include <dlfcn.h>
 #include <stdio.h>
 #include <unistd.h>
@@ -31,11 +30,33 @@ try:
 except ImportError:
     LUA_AVAILABLE = False
 
+import config
+import metrics
+from cache import LRUCache
+from lua_lexer import find_syntax_errors
+from sandbox import LuaRuntimePool, create_sandbox
+from process_registry import ProcessRegistry
+from execution_log import ExecutionLog
+from history import ExecutionHistory
+
 class RobloxExecutor:
     def __init__(self):
         self.injected = False
         self.roblox_process = None
         self.system = platform.system()
+        # Shared by discovery, is_injected() and get_roblox_info()
+        self.processes = ProcessRegistry()
+        # Runtimes in this process only compile for validation; test runs go
+        # to the sandbox (worker processes unless SYNAPSE_SANDBOX_WORKERS=0)
+        self.runtime_pool = LuaRuntimePool() if LUA_AVAILABLE else None
+        self.sandbox = create_sandbox(self.runtime_pool) if LUA_AVAILABLE else None
+        # Validation results keyed by script hash; execute() and
+        # test_script_locally() both validate, often the same script
+        self.validation_cache = LRUCache(config.VALIDATION_CACHE_MAX_BYTES)
+        # Entries are written, rotated and compressed by a background thread
+        self.execution_log = ExecutionLog()
+        # One JSON line per execute, queryable through /api/history
+        self.history = ExecutionHistory()
         
     def find_roblox_process(self):
         """Find the running Roblox process"""
@@ -45,17 +66,12 @@ class RobloxExecutor:
             'Linux': ['RobloxPlayer']
         }
         
-        process_names = roblox_names.get(self.system, [])
-        
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                proc_name = proc.info['name']
-                if any(roblox_name.lower() in proc_name.lower() for roblox_name in process_names):
-                    return proc
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
+        process_names = [name.lower() for name in roblox_names.get(self.system, [])]
         
-        return None
+        matches = self.processes.find(
+            lambda proc_name: any(roblox_name in proc_name.lower() for roblox_name in process_names)
+        )
+        return matches[0] if matches else None
     
     def inject(self):
         """Inject into Roblox process"""
@@ -83,71 +99,48 @@ class RobloxExecutor:
         
         # Check if Roblox process still exists
         if self.roblox_process:
-            try:
-                if not self.roblox_process.is_running():
-                    self.injected = False
-                    return False
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
+            if not self.processes.is_running(self.roblox_process):
                 self.injected = False
                 return False
         
         return True
     
-    def validate_lua_syntax(self, script):
-        """Validate Lua syntax and return any errors"""
+    def validate_lua_syntax(self, script, heuristic_errors=None):
+        """Validate Lua syntax and return any errors
+        
+        heuristic_errors may carry the find_syntax_errors() result for this
+        script when the caller already has it (e.g. an incremental document).
+        """
         if not script.strip():
             return False, "Script is empty"
         
-        # Basic Lua syntax checks
-        errors = []
-        
-        # Check for common syntax errors
-        lines = script.split('\n')
-        
-        # Check for balanced parentheses, brackets, and braces
-        stack = []
-        pairs = {'(': ')', '[': ']', '{': '}'}
-        reverse_pairs = {')': '(', ']': '[', '}': '{'}
-        
-        for line_num, line in enumerate(lines, 1):
-            # Skip comments
-            clean_line = re.sub(r'--.*$', '', line)
-            
-            for char in clean_line:
-                if char in pairs:
-                    stack.append((char, line_num))
-                elif char in reverse_pairs:
-                    if not stack or stack[-1][0] != reverse_pairs[char]:
-                        errors.append(f"Line {line_num}: Unmatched '{char}'")
-                        break
-                    stack.pop()
-        
-        if stack:
-            char, line_num = stack[-1]
-            errors.append(f"Line {line_num}: Unclosed '{char}'")
-        
-        # Check for common Lua syntax patterns
-        for line_num, line in enumerate(lines, 1):
-            clean_line = line.strip()
-            
-            # Check for incomplete if/then statements
-            if clean_line.startswith('if ') and 'then' not in clean_line:
-                if line_num < len(lines) and 'then' not in lines[line_num].strip():
-                    errors.append(f"Line {line_num}: 'if' statement missing 'then'")
-            
-            # Check for incomplete function definitions
-            if clean_line.startswith('function ') and not clean_line.endswith(')'):
-                if '(' in clean_line and ')' not in clean_line:
-                    errors.append(f"Line {line_num}: Incomplete function definition")
+        with metrics.phase('validate'):
+            key = hashlib.sha256(script.encode('utf-8', 'surrogatepass')).hexdigest()
+            result = self.validation_cache.get(key)
+            if result is None:
+                result = self._check_lua_syntax(script, heuristic_errors)
+                self.validation_cache.put(key, result)
+        metrics.VALIDATIONS.inc('valid' if result[0] else 'invalid')
+        return result
+    
+    def _check_lua_syntax(self, script, heuristic_errors=None):
+        """Run the full syntax check (uncached)"""
+        # Cheap single-pass checks (brackets, if/then, function headers)
+        # that skip strings and comments; see lua_lexer
+        if heuristic_errors is None:
+            heuristic_errors = find_syntax_errors(script)
+        errors = list(heuristic_errors)
         
         # Try to validate with Lua runtime if available
         if LUA_AVAILABLE and not errors:
             try:
-                lua = LuaRuntime(unpack_returned_tuples=True)
-                # Try to load the script (doesn't execute, just validates syntax)
-                lua.execute(f"return function() {script} end")
+                # Compile only (doesn't execute) on a warm runtime from the pool
+                with self.runtime_pool.checkout() as runtime:
+                    error_msg = runtime.compile(script)
             except Exception as e:
                 error_msg = str(e)
+            
+            if error_msg:
                 # Extract line number if present
                 match = re.search(r':(\d+):', error_msg)
                 if match:
@@ -163,16 +156,38 @@ class RobloxExecutor:
     
     def execute(self, script):
         """Execute a Lua script with realistic simulation"""
+        success, plan = self.prepare_execution(script)
+        if not success:
+            return False, plan
+        
+        time.sleep(plan['delay'])
+        return self.finish_execution(plan)
+    
+    def prepare_execution(self, script):
+        """
+        Validate and log a script for execution.
+        Returns: (success, error message or execution plan). The plan's
+        'delay' is the simulated execution time to wait before calling
+        finish_execution(plan); the job queue waits it out on a timer.
+        Every call ends up as one record in the execution history.
+        """
+        started = time.monotonic()
+        script_hash = hashlib.sha256(script.encode('utf-8', 'surrogatepass')).hexdigest()
+        
+        def rejected(outcome, message):
+            self.history.record(script_hash, len(script), outcome, time.monotonic() - started)
+            return False, message
+        
         if not self.is_injected():
-            return False, "Not injected into Roblox"
+            return rejected('not_injected', "Not injected into Roblox")
         
         if not script.strip():
-            return False, "Script is empty"
+            return rejected('empty', "Script is empty")
         
         # First, validate the Lua syntax
         syntax_valid, syntax_message = self.validate_lua_syntax(script)
         if not syntax_valid:
-            return False, f"Syntax Error:\n{syntax_message}"
+            return rejected('syntax_error', f"Syntax Error:\n{syntax_message}")
         
         try:
             # Simulate script execution with realistic behavior
@@ -202,25 +217,39 @@ class RobloxExecutor:
             # Simulate execution time based on script complexity
             lines = len([l for l in script.split('\n') if l.strip() and not l.strip().startswith('--')])
             execution_time = min(0.1 + (lines * 0.01), 1.0)
-            time.sleep(execution_time)
-            
-            # Build success message
-            message = "✓ Script executed successfully"
-            if detected_calls:
-                message += "\n\nDetected API calls:"
-                message += "\n" + "\n".join(detected_calls)
             
-            message += f"\n\n[Simulated execution - {lines} lines processed]"
-            
-            return True, message
+            return True, {
+                'detected_calls': detected_calls,
+                'lines': lines,
+                'delay': execution_time,
+                'hash': script_hash,
+                'length': len(script),
+                'started': started,
+            }
         
         except Exception as e:
-            return False, f"Execution error: {str(e)}"
+            return rejected('error', f"Execution error: {str(e)}")
     
-    def test_script_locally(self, script):
+    def finish_execution(self, plan):
+        """Build the result of an execution prepared by prepare_execution"""
+        self.history.record(plan['hash'], plan['length'], 'success', time.monotonic() - plan['started'])
+        detected_calls = plan['detected_calls']
+        
+        # Build success message
+        message = "✓ Script executed successfully"
+        if detected_calls:
+            message += "\n\nDetected API calls:"
+            message += "\n" + "\n".join(detected_calls)
+        
+        message += f"\n\n[Simulated execution - {plan['lines']} lines processed]"
+        
+        return True, message
+    
+    def test_script_locally(self, script, timeout=None, on_output=None):
         """
         Test a Lua script locally using a sandboxed Lua interpreter.
         This allows testing script logic without Roblox.
+        on_output, if given, receives printed lines as the script runs.
         Returns: (success, output/error message, console_output)
         """
         if not LUA_AVAILABLE:
@@ -234,79 +263,50 @@ class RobloxExecutor:
         if not syntax_valid:
             return False, f"Syntax Error:\n{syntax_message}", ""
         
-        try:
-            lua = LuaRuntime(unpack_returned_tuples=True)
-            
-            # Capture print outputs
-            console_output = []
-            
-            # Create a mock print function to capture output
-            lua.execute("""
-                _original_print = print
-                _console_output = {}
-                function print(...)
-                    local args = {...}
-                    local output = ""
-                    for i, v in ipairs(args) do
-                        if i > 1 then output = output .. "\\t" end
-                        output = output .. tostring(v)
-                    end
-                    table.insert(_console_output, output)
-                end
-            """)
-            
-            # Create mock Roblox API to prevent errors
-            lua.execute("""
-                -- Mock Roblox game object
-                game = {
-                    GetService = function(self, service)
-                        return {
-                            _name = service,
-                            SetCore = function() end,
-                        }
-                    end,
-                }
-                
-                -- Mock workspace
-                workspace = {
-                    _name = "Workspace",
-                }
-                
-                -- Mock wait function
-                function wait(duration)
-                    return duration or 0
-                end
-                
-                -- Mock spawn function  
-                function spawn(func)
-                    func()
-                end
-                
-                -- Mock Instance
-                Instance = {
-                    new = function(className)
-                        return {
-                            _className = className,
-                            Name = "MockInstance",
-                        }
-                    end
-                }
-            """)
-            
-            # Execute the user's script
-            lua.execute(script)
-            
-            # Get console output
-            output_table = lua.eval('_console_output')
-            if output_table:
-                for item in output_table.values():
-                    console_output.append(str(item))
-            
+        return self._format_test_result(self.sandbox.run(script, timeout, on_output))
+    
+    def test_scripts_locally(self, scripts, timeout=None):
+        """
+        Test many scripts at once, spread over all sandbox workers.
+        scripts is a dict of name -> content.
+        Returns: dict of name -> (success, output/error message, console_output)
+        """
+        results = {}
+        if not LUA_AVAILABLE:
+            for name in scripts:
+                results[name] = (False, "Lua interpreter not available. Install lupa: pip install lupa", "")
+            return results
+        
+        # Syntax checks are cheap and cached, so only valid scripts get a worker
+        runnable = []
+        for name, script in scripts.items():
+            if not script.strip():
+                results[name] = (False, "Script is empty", "")
+                continue
+            syntax_valid, syntax_message = self.validate_lua_syntax(script)
+            if not syntax_valid:
+                results[name] = (False, f"Syntax Error:\n{syntax_message}", "")
+                continue
+            runnable.append(name)
+        
+        outcomes = self.sandbox.run_batch([scripts[name] for name in runnable], timeout)
+        for name, outcome in zip(runnable, outcomes):
+            results[name] = self._format_test_result(outcome)
+        
+        return {name: results[name] for name in scripts}
+    
+    def _format_test_result(self, result):
+        """Turn a sandbox result dict into (success, message, console_output)"""
+        console_output = result['console']
+        
+        if result['ok']:
             # Build result message
             result_msg = "✓ Script tested successfully (local Lua interpreter)"
             
             if console_output:
                 result_msg += "\n\n📄 Console Output:"
+                if result.get('dropped'):
+                    result_msg += f" (last {len(console_output)} lines, {result['dropped']} earlier lines dropped)"
                 result_msg += "\n" + "\n".join([f"  {line}" for line in console_output])
             else:
                 result_msg += "\n\n(No console output)"
@@ -316,66 +316,39 @@ class RobloxExecutor:
             
             return True, result_msg, "\n".join(console_output)
         
-        except Exception as e:
-            error_msg = str(e)
-            # Try to extract useful error information
-            if ':' in error_msg:
-                parts = error_msg.split(':', 2)
-                if len(parts) >= 3:
-                    error_msg = parts[-1].strip()
-            
-            return False, f"Runtime Error:\n{error_msg}", "\n".join(console_output) if console_output else ""
+        error_msg = result['error']
+        if result.get('budget_exceeded') or result.get('timed_out'):
+            # Already a complete message, e.g. "Budget exceeded: ..."
+            return False, error_msg, "\n".join(console_output) if console_output else ""
+        
+        # Try to extract useful error information
+        if ':' in error_msg:
+            parts = error_msg.split(':', 2)
+            if len(parts) >= 3:
+                error_msg = parts[-1].strip()
+        
+        return False, f"Runtime Error:\n{error_msg}", "\n".join(console_output) if console_output else ""
     
     def log_execution(self, script):
-        """Log script execution to a file"""
-        try:
-            log_dir = "logs"
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir)
-            
-            log_file = os.path.join(log_dir, "execution_log.txt")
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-            
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"\n{'='*50}\n")
-                f.write(f"Timestamp: {timestamp}\n")
-                f.write(f"{'='*50}\n")
-                f.write(script)
-                f.write(f"\n{'='*50}\n")
-        
-        except Exception as e:
-            print(f"Failed to log execution: {e}")
+        """Queue a script execution for the log file"""
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        rule = '=' * 50
+        self.execution_log.write(f"\n{rule}\nTimestamp: {timestamp}\n{rule}\n{script}\n{rule}\n")
     
     def get_roblox_info(self):
         """Get information about the Roblox process"""
         if not self.roblox_process:
             return None
         
-        try:
-            return {
-                'pid': self.roblox_process.pid,
-                'name': self.roblox_process.name(),
-                'status': self.roblox_process.status(),
-                'memory': self.roblox_process.memory_info().rss / 1024 / 1024  # MB
-            }
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            return None
+        return self.processes.info(self.roblox_process)
 
     def find_roblox_pid(self):
         """Find the PID of the running Roblox process"""
         try:
-            # Iterate over all running processes
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    # Check if the process name matches RobloxPlayer
-                    if proc.info['name'] == "RobloxPlayer":
-                        return proc.info['pid']
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-            
-            return None
+            # Check the cached process list for a RobloxPlayer process
+            matches = self.processes.find(lambda proc_name: proc_name == "RobloxPlayer")
+            return matches[0].pid if matches else None
         except Exception as e:
             print(f"Error finding Roblox PID: {e}")
             return None
 
-char injectedCode[] = "\x55\x48\x89\xe5..." // x86-64 assembly
@@ -0,0 +1,177 @@
+"""
+Structured execution history (logs/history.jsonl, served by /api/history).
+
+Each execute appends one JSON line with a fixed key order:
+
+    {"ts":...,"hash":"<sha256>","length":...,"outcome":"...","duration":...}
+
+Lines go through an ExecutionLog writer thread, so recording a run costs an
+execute nothing but a queue append. Queries read the file through mmap and
+walk it backwards from the newest record:
+
+- the last N runs are found by scanning back for newlines from the end;
+- a script hash is found with mmap.rfind() on its "hash" field, which runs
+  at memory speed without parsing the records in between;
+- a time range is narrowed to a byte range first with a sparse index of
+  (timestamp, offset) pairs taken every INDEX_STRIDE bytes. The index is
+  built on the first query and extended as the file grows.
+
+Pages are newest first; a page's cursor is the byte offset to continue
+below.
+"""
+
+import json
+import mmap
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import config
+from execution_log import ExecutionLog
+
+INDEX_STRIDE = 64 * 1024
+
+
+class ExecutionHistory:
+    """Appends run records and answers paged queries over them."""
+
+    def __init__(self, log_dir="logs", filename="history.jsonl"):
+        self.path = os.path.join(log_dir, filename)
+        self.writer = ExecutionLog(log_dir, filename, rotate=False)
+        # Sparse index: _index_ts[i] is the timestamp of the record starting
+        # at _index_offsets[i]; offsets are at least INDEX_STRIDE apart
+        self._index_ts = []
+        self._index_offsets = []
+        self._indexed_to = 0
+        self._lock = threading.Lock()
+        self._stats = {'recorded': 0, 'queries': 0}
+
+    def record(self, script_hash, length, outcome, duration):
+        """Queue one run record"""
+        line = json.dumps({
+            'ts': round(time.time(), 3),
+            'hash': script_hash,
+            'length': length,
+            'outcome': outcome,
+            'duration': round(duration, 4),
+        }, separators=(',', ':'))
+        with self._lock:
+            self._stats['recorded'] += 1
+        return self.writer.write(line + '\n')
+
+    def close(self):
+        self.writer.close()
+
+    def query(self, limit=None, cursor=None, since=None, until=None, script_hash=None):
+        """Return (records, next_cursor) newest first.
+
+        cursor     -- byte offset from a previous page's next_cursor
+        since      -- only runs at or after this Unix time
+        until      -- only runs before this Unix time
+        script_hash -- only runs of scripts whose hash starts with this
+        """
+        limit = max(1, min(limit or config.HISTORY_PAGE_SIZE, config.HISTORY_PAGE_MAX))
+        with self._lock:
+            self._stats['queries'] += 1
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return [], None
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return [], None
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                # The writer may be part way through a line
+                end = mm.rfind(b'\n') + 1
+                start = 0
+                if since is not None or until is not None:
+                    start, end = self._byte_range(mm, end, since, until)
+                if cursor is not None:
+                    end = min(end, cursor)
+                return self._scan_back(mm, start, end, limit, since, until, script_hash)
+
+    def _scan_back(self, mm, start, end, limit, since, until, script_hash):
+        needle = f'"hash":"{script_hash}'.encode('ascii') if script_hash else None
+        records = []
+        pos = end
+        while pos > start and len(records) < limit:
+            if needle is not None:
+                hit = mm.rfind(needle, start, pos)
+                if hit < 0:
+                    pos = start
+                    break
+                line_start = mm.rfind(b'\n', start, hit) + 1 or start
+                line_end = mm.find(b'\n', hit, pos)
+                if line_end < 0:
+                    line_end = pos
+            else:
+                line_end = pos - 1 if mm[pos - 1:pos] == b'\n' else pos
+                line_start = mm.rfind(b'\n', start, line_end) + 1 or start
+            pos = line_start
+
+            try:
+                record = json.loads(mm[line_start:line_end])
+            except ValueError:
+                continue
+            ts = record.get('ts', 0)
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts >= until:
+                continue
+            records.append(record)
+        return records, (pos if pos > start else None)
+
+    def _byte_range(self, mm, end, since, until):
+        """Offsets bounding the records between since and until"""
+        with self._lock:
+            self._extend_index(mm, end)
+            timestamps, offsets = self._index_ts, self._index_offsets
+            start = 0
+            if since is not None:
+                # The last indexed record before since starts a block that
+                # may still hold matching records
+                i = bisect_left(timestamps, since) - 1
+                if i >= 0:
+                    start = offsets[i]
+            if until is not None:
+                i = bisect_right(timestamps, until)
+                # Timestamps are only roughly ordered; allow one extra block
+                if i + 1 < len(offsets):
+                    end = offsets[i + 1]
+        return start, end
+
+    def _extend_index(self, mm, end):
+        if self._index_offsets and self._index_offsets[-1] >= end:
+            # The file was truncated or replaced
+            self._index_ts, self._index_offsets, self._indexed_to = [], [], 0
+        pos = self._indexed_to
+        while pos < end:
+            # First record starting at or after pos
+            if pos:
+                newline = mm.find(b'\n', pos - 1, end)
+                if newline < 0:
+                    break
+                pos = newline + 1
+                if pos >= end:
+                    break
+            line_end = mm.find(b'\n', pos, end)
+            try:
+                ts = json.loads(mm[pos:line_end]).get('ts', 0)
+            except ValueError:
+                ts = self._index_ts[-1] if self._index_ts else 0
+            # Keep the index sorted even if the clock stepped back
+            if self._index_ts:
+                ts = max(ts, self._index_ts[-1])
+            self._index_ts.append(ts)
+            self._index_offsets.append(pos)
+            pos += INDEX_STRIDE
+        self._indexed_to = max(self._indexed_to, pos)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['index_points'] = len(self._index_offsets)
+        stats['writer'] = self.writer.stats()
+        return stats
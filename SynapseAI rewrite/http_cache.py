@@ -0,0 +1,236 @@
+"""
+HTTP validators and compression for the web UI.
+
+Hub listings carry strong ETags derived from the hub state, so repeat opens
+are answered with 304 Not Modified. JSON responses are compressed on the way
+out, and static assets are served from memory with their gzip (and, when the
+brotli package is installed, br) variants compressed once up front.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import uuid
+import zlib
+
+from flask import Response, request
+
+import config
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Salts every state-derived ETag: counters restart with the process, the
+# validators they produced must not match afterwards
+BOOT_ID = uuid.uuid4().hex[:8]
+
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+_ENCODING_SUFFIX = {'br': '-br', 'gzip': '-gz'}
+
+
+def make_etag(*parts):
+    """Strong ETag for the given state parts."""
+    digest = hashlib.sha1('\0'.join(str(part) for part in (BOOT_ID,) + parts).encode('utf-8'))
+    return f'"{digest.hexdigest()[:20]}"'
+
+
+def encoded_etag(etag, encoding):
+    """ETag of etag's representation in a content coding (each gets its own)."""
+    suffix = _ENCODING_SUFFIX.get(encoding)
+    return etag[:-1] + suffix + '"' if suffix else etag
+
+
+def etag_matches(etag):
+    """Whether the request's If-None-Match covers etag (in any encoding)."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = {etag} | {encoded_etag(etag, encoding) for encoding in _ENCODING_SUFFIX}
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in candidates:
+            return True
+    return False
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.headers['ETag'] = etag
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def negotiate_encoding(allow_br=True):
+    """Pick the best content coding the client accepts: 'br', 'gzip' or None."""
+    accepted = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    if allow_br and BROTLI_AVAILABLE and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data)
+    return gzip.compress(data, compresslevel=config.HTTP_GZIP_LEVEL)
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of str/bytes chunks incrementally."""
+    compressor = zlib.compressobj(config.HTTP_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response):
+    """after_request hook: compress JSON bodies the client can decode."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.mimetype != 'application/json'
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    if 'Accept-Encoding' not in response.headers.get('Vary', ''):
+        response.headers.add('Vary', 'Accept-Encoding')
+    etag = response.headers.get('ETag')
+    if etag:
+        response.headers['ETag'] = encoded_etag(etag, encoding)
+    return response
+
+
+class _Asset:
+    __slots__ = ('signature', 'etag', 'version', 'mimetype', 'variants')
+
+
+class StaticAssets:
+    """Serves files from a directory out of memory, precompressed.
+
+    A file is re-read only when its mtime or size changes. url_for('static')
+    adds ?v=<content hash> through url_defaults(), and only a URL carrying
+    the current hash is cached as immutable.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def _load(self, filename):
+        path = os.path.abspath(os.path.join(self.root, filename))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            asset = self._assets.get(filename)
+            if asset is not None and asset.signature == signature:
+                return asset
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        asset = _Asset()
+        asset.signature = signature
+        digest = hashlib.sha1(data).hexdigest()
+        asset.etag = '"' + digest[:20] + '"'
+        asset.version = digest[:12]
+        asset.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        asset.variants = {None: data}
+        if len(data) >= MIN_COMPRESS_SIZE and not asset.mimetype.startswith(('image/', 'font/')):
+            asset.variants['gzip'] = compress(data, 'gzip')
+            if BROTLI_AVAILABLE:
+                asset.variants['br'] = compress(data, 'br')
+
+        with self._lock:
+            self._assets[filename] = asset
+        return asset
+
+    def serve(self, filename):
+        """Flask view for /static/<path:filename>."""
+        asset = self._load(filename)
+        if asset is None:
+            return Response('Not Found', status=404, mimetype='text/plain')
+
+        # A URL naming the current content hash never changes meaning; any
+        # other (a page rendered before the file was edited) is revalidated
+        if request.args.get('v') == asset.version:
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = 'no-cache'
+
+        if etag_matches(asset.etag):
+            response = not_modified(asset.etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        encoding = negotiate_encoding()
+        if encoding not in asset.variants:
+            encoding = None
+        response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        response.headers['ETag'] = encoded_etag(asset.etag, encoding)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def url_defaults(self, endpoint, values):
+        """Flask url_defaults hook: version static URLs by content hash."""
+        if endpoint != 'static' or 'v' in values:
+            return
+        asset = self._load(values.get('filename', ''))
+        if asset is not None:
+            values['v'] = asset.version
+
+    def stats(self):
+        with self._lock:
+            return {
+                'assets': len(self._assets),
+                'bytes': sum(
+                    len(variant)
+                    for asset in self._assets.values()
+                    for variant in asset.variants.values()
+                ),
+                'brotli': BROTLI_AVAILABLE,
+            }
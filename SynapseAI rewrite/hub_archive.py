@@ -0,0 +1,146 @@
+"""
+Streaming export and import of the whole Script Hub as a tar archive.
+
+The archive holds one <id>.lua and <id>.json (name and description) per
+script, the same layout as the scripts/ folder, so an export can also be
+unpacked by hand. Neither direction holds more than one batch of scripts in
+memory: exports are written member by member into the response, imports
+are read member by member from the request body and saved in batches
+through ScriptHub.put_scripts().
+"""
+
+import json
+import posixpath
+import tarfile
+import time
+
+import config
+
+# Larger members are skipped on import
+MAX_MEMBER_BYTES = 16 * 1024 * 1024
+
+
+def _member(name, data, mtime):
+    """A tar member (header, data, padding) for a regular file."""
+    encoded = name.encode('utf-8')
+    if len(encoded) >= 100 or not name.isascii():
+        # Needs a pax extended header; rare enough to leave to tarfile
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime, info.mode = len(data), mtime, 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+    else:
+        # tarfile builds every header through several layers of copies;
+        # a plain ustar header for a short ASCII name is a few slices
+        header = bytearray(tarfile.BLOCKSIZE)
+        header[0:len(encoded)] = encoded
+        header[100:108] = b'0000644\0'
+        header[108:116] = b'0000000\0'
+        header[116:124] = b'0000000\0'
+        header[124:136] = b'%011o\0' % len(data)
+        header[136:148] = b'%011o\0' % mtime
+        header[148:156] = b' ' * 8
+        header[156:157] = tarfile.REGTYPE
+        header[257:265] = tarfile.POSIX_MAGIC
+        header[148:156] = b'%06o\0 ' % sum(header)
+    padding = -len(data) % tarfile.BLOCKSIZE
+    return b''.join((header, data, b'\0' * padding))
+
+
+def export_archive(hub):
+    """Yield an uncompressed tar of every hub script, one script at a time."""
+    mtime = int(time.time())
+    for item in hub.iter_scripts():
+        content = hub.get_script_content(item['id'])
+        if content is None:
+            continue
+        metadata = {'name': item['name'], 'description': item['description']}
+        yield (
+            _member(item['id'] + '.lua', content.encode('utf-8'), mtime)
+            + _member(item['id'] + '.json', json.dumps(metadata, indent=4).encode('utf-8'), mtime)
+        )
+    # End-of-archive marker
+    yield b'\0' * (2 * tarfile.BLOCKSIZE)
+
+
+def _script_id(member_name):
+    """Script id and kind ('lua' or 'json') of an archive member, or None."""
+    name = posixpath.basename(member_name)
+    stem, dot, extension = name.rpartition('.')
+    if not dot or extension not in ('lua', 'json') or not stem or stem.startswith('.'):
+        return None
+    if '\\' in stem or stem != stem.strip():
+        return None
+    return stem, extension
+
+
+def import_archive(hub, stream, batch_size=None):
+    """Save every script in a (optionally gzip-compressed) tar read from stream.
+
+    Scripts are written through hub.put_scripts() batch_size at a time.
+    A script whose metadata member is missing is named after its file, like
+    in the scripts/ folder; one whose name or description is not a string is
+    skipped. Returns {'imported': n, 'skipped': n}.
+    """
+    batch_size = batch_size or config.HUB_IMPORT_BATCH
+    scripts = {}    # id -> content, waiting for its metadata
+    metadata = {}   # id -> metadata, waiting for its script
+    batch = []
+    counts = {'imported': 0, 'skipped': 0}
+
+    def flush():
+        if batch:
+            hub.put_scripts(batch)
+            counts['imported'] += len(batch)
+            batch.clear()
+
+    def ready(script_id, content, meta):
+        name = meta.get('name')
+        description = meta.get('description')
+        # null counts as missing; any other non-string would reach the
+        # search index and the hub's own files
+        if name is None:
+            name = script_id
+        if description is None:
+            description = 'No description available'
+        if not isinstance(name, str) or not isinstance(description, str):
+            counts['skipped'] += 1
+            return
+        batch.append((script_id, name, description, content))
+        if len(batch) >= batch_size:
+            flush()
+
+    with tarfile.open(fileobj=stream, mode='r|*') as tar:
+        for member in tar:
+            parsed = _script_id(member.name) if member.isfile() else None
+            if parsed is None or member.size > MAX_MEMBER_BYTES:
+                counts['skipped'] += 1
+                continue
+            script_id, kind = parsed
+            data = tar.extractfile(member).read()
+            try:
+                text = data.decode('utf-8')
+                if kind == 'json':
+                    meta = json.loads(text)
+                    if not isinstance(meta, dict):
+                        raise ValueError("metadata is not an object")
+            except ValueError:
+                counts['skipped'] += 1
+                continue
+
+            # Exports put each script next to its metadata; other archives
+            # may not, so either half waits for the other
+            if kind == 'lua':
+                if script_id in metadata:
+                    ready(script_id, text, metadata.pop(script_id))
+                else:
+                    scripts[script_id] = text
+            elif script_id in scripts:
+                ready(script_id, scripts.pop(script_id), meta)
+            else:
+                metadata[script_id] = meta
+
+    for script_id, content in scripts.items():
+        ready(script_id, content, {})
+    counts['skipped'] += len(metadata)
+    flush()
+    return counts
@@ -0,0 +1,193 @@
+"""
+Background job queue for /api/execute.
+
+Requests submit a job and get its id straight away; a few worker threads run
+the jobs and clients poll (or long-poll) /api/jobs/<id> for the result.
+
+A job step may return Deferred(delay, next_step) to continue later. Delays
+are kept in a timer heap served by one scheduler thread, so a job waiting
+out its (simulated) execution time holds no thread at all.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import config
+
+
+class QueueFull(Exception):
+    """Too many jobs are waiting to run."""
+
+
+class Deferred:
+    """Returned by a job step: run next_step after delay seconds."""
+
+    def __init__(self, delay, next_step):
+        self.delay = delay
+        self.next_step = next_step
+
+
+class Job:
+    def __init__(self, step):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.result = None
+        self.created = time.time()
+        self.finished = None
+        self._step = step
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'created': self.created,
+            'finished': self.finished,
+        }
+        if self.result is not None:
+            data.update(self.result)
+        return data
+
+
+class JobQueue:
+    """Runs submitted jobs on a small fixed set of threads.
+
+    workers    -- threads running job steps
+    max_jobs   -- queued plus running jobs accepted before QueueFull
+    retention  -- seconds a finished job's result stays available
+    """
+
+    def __init__(self, workers=None, max_jobs=None, retention=None):
+        self.workers = max(1, workers or config.JOB_WORKERS)
+        self.max_jobs = max_jobs or config.JOB_QUEUE_MAX
+        self.retention = retention or config.JOB_RETENTION
+
+        self._jobs = OrderedDict()  # id -> Job, in submission order
+        self._ready = deque()       # jobs whose next step can run now
+        self._timers = []           # heap of (due, seq, job)
+        self._seq = itertools.count()
+        self._active = 0
+        self._cond = threading.Condition()
+        self._started = False
+        self._closed = False
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"synapse-job-{i}", daemon=True).start()
+        threading.Thread(target=self._schedule, name="synapse-job-timers", daemon=True).start()
+
+    def submit(self, step):
+        """Queue step() to run in the background and return the new Job.
+
+        step returns the job's result dict, or a Deferred to continue later.
+        """
+        self.start()
+        job = Job(step)
+        with self._cond:
+            self._prune(time.time())
+            if self._closed:
+                self._stats['rejected'] += 1
+                raise QueueFull("shutting down")
+            if self._active >= self.max_jobs:
+                self._stats['rejected'] += 1
+                raise QueueFull(f"{self._active} jobs are already pending")
+            self._jobs[job.id] = job
+            self._active += 1
+            self._stats['submitted'] += 1
+            self._ready.append(job)
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id, wait=0):
+        """Return the job (None if unknown), waiting up to wait seconds for it to finish."""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            job = self._jobs.get(job_id)
+            while job is not None and job.status != 'done':
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return job
+
+    def close(self, wait=0):
+        """Refuse new jobs and wait up to wait seconds for pending ones; True if none are left."""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            self._closed = True
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return not self._active
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                job = self._ready.popleft()
+                job.status = 'running'
+
+            try:
+                outcome = job._step()
+            except Exception as e:
+                outcome = {'success': False, 'message': f"Execution error: {str(e)}"}
+
+            with self._cond:
+                if isinstance(outcome, Deferred):
+                    job._step = outcome.next_step
+                    heapq.heappush(
+                        self._timers,
+                        (time.monotonic() + outcome.delay, next(self._seq), job)
+                    )
+                else:
+                    job.result = outcome
+                    job.status = 'done'
+                    job.finished = time.time()
+                    job._step = None
+                    self._active -= 1
+                    self._stats['completed' if outcome.get('success') else 'failed'] += 1
+                self._cond.notify_all()
+
+    def _schedule(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._timers and self._timers[0][0] <= now:
+                    _, _, job = heapq.heappop(self._timers)
+                    self._ready.append(job)
+                    self._cond.notify_all()
+                self._cond.wait(self._timers[0][0] - now if self._timers else None)
+
+    def _prune(self, now):
+        # Finished jobs are dropped once their result has been kept long enough
+        expired = []
+        for job_id, job in self._jobs.items():
+            if now - job.created <= self.retention:
+                break
+            if job.status == 'done' and now - job.finished > self.retention:
+                expired.append(job_id)
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'pending': self._active,
+                'ready': len(self._ready),
+                'sleeping': len(self._timers),
+                'retained': len(self._jobs),
+                'workers': self.workers,
+            })
+            return stats
@@ -0,0 +1,390 @@
+"""
+Single-pass Lua lexer for the pre-validation stage of validate_lua_syntax.
+
+Only the tokens the cheap syntax heuristics care about are recognized:
+brackets, statement-leading ``if``/``function``, ``then`` and lexical errors.
+Strings, long brackets (``[==[ ... ]==]``) and comments (including
+``--[[ ... ]]``) are consumed whole so their contents never count as code.
+"""
+
+import re
+
+# Every match is a run of plain code followed by exactly one token. The run
+# stops at any character that can start a token, and every such character
+# matches one of the alternatives, so the scan never backtracks and the regex
+# engine (not Python) walks over ordinary code. Alternatives are tried left to
+# right, so comments come before '-' and long brackets before a plain '['.
+TOKEN_RE = re.compile(
+    r"""
+    [^\n\-\[\]"'(){}]*
+    (?:
+        (?P<nl>\n)(?:[ \t]*(?P<lead>if|function)\b)?
+      | (?P<open>[({])
+      | (?P<close>[)\]}])
+      | (?P<string>"[^"\\\n]*"|'[^'\\\n]*')
+      | (?P<escaped_string>"[^"\\\n]*(?:\\(?:z\s*|.)[^"\\\n]*)*"|'[^'\\\n]*(?:\\(?:z\s*|.)[^'\\\n]*)*')
+      | (?P<open_string>"(?:[^"\\\n]|\\(?:z\s*|.))*|'(?:[^'\\\n]|\\(?:z\s*|.))*)
+      | (?P<long_comment>--\[(?P<lc_eq>=*)\[.*?\](?P=lc_eq)\])
+      | (?P<open_long_comment>--\[=*\[)
+      | (?P<comment>--[^\n]*)
+      | (?P<minus>-)
+      | (?P<long_string>\[(?P<ls_eq>=*)\[.*?\](?P=ls_eq)\])
+      | (?P<open_long_string>\[=*\[)
+      | (?P<bracket>\[)
+      | (?P<end>\Z)
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+LEAD_RE = re.compile(r'[ \t]*(if|function)\b')
+THEN_RE = re.compile(r'\bthen\b')
+
+_OPEN_FOR_CLOSE = {')': '(', ']': '[', '}': '{'}
+
+
+def find_syntax_errors(source):
+    """Lex source once and run every heuristic check on the fly.
+
+    Strings, long brackets and comments are skipped as whole tokens, so
+    brackets or keywords inside them are never counted. Returns a list of
+    "Line N: message" strings, bracket errors first.
+    """
+    errors = []            # bracket and lexical errors
+    statement_errors = []  # if/then and function header heuristics
+    stack = []
+    line = 1
+    skip_line = 0        # line whose remaining brackets are ignored
+
+    if_lines = []        # lines of 'if's still waiting for their 'then'
+    function_line = 0    # line of a 'function' statement being read
+    function_parens = 0  # bit 1 = '(' seen on that line, bit 2 = ')' seen
+
+    lead = LEAD_RE.match(source)
+    if lead:
+        if lead.group(1) == 'if':
+            if_lines.append(1)
+        else:
+            function_line = 1
+
+    for match in TOKEN_RE.finditer(source):
+        kind = match.lastgroup
+        if if_lines:
+            # Look for 'then' in the plain code in front of this token
+            token_start = match.start('nl' if kind == 'lead' else kind)
+            if THEN_RE.search(source, match.start(), token_start):
+                if_lines = []
+
+        if kind == 'nl' or kind == 'lead':
+            newlines = 1
+        elif kind == 'string':
+            continue
+        elif kind == 'open' or kind == 'bracket':
+            char = match.group(kind)
+            if line != skip_line:
+                stack.append((char, line))
+            if char == '(' and function_line:
+                function_parens |= 1
+            continue
+        elif kind == 'close':
+            char = match.group(kind)
+            if line != skip_line:
+                if not stack or stack[-1][0] != _OPEN_FOR_CLOSE[char]:
+                    errors.append(f"Line {line}: Unmatched '{char}'")
+                    # Skip this line's remaining brackets to avoid cascades
+                    skip_line = line
+                else:
+                    stack.pop()
+            if char == ')' and function_line:
+                function_parens |= 2
+            continue
+        elif kind == 'escaped_string' or kind == 'long_comment' or kind == 'long_string':
+            newlines = match.group(kind).count('\n')
+            if not newlines:
+                continue
+        elif kind == 'end':
+            break
+        elif kind == 'open_string':
+            # Runs to the end of the line it finally fails on
+            newlines = match.group(kind).count('\n')
+            errors.append(f"Line {line + newlines}: Unfinished string")
+            if not newlines:
+                continue
+        elif kind == 'open_long_comment':
+            errors.append(f"Line {line}: Unfinished long comment")
+            break
+        elif kind == 'open_long_string':
+            errors.append(f"Line {line}: Unfinished long string")
+            break
+        else:
+            continue
+
+        # Settle the per-line statement checks for every line that ended
+        if function_line or if_lines:
+            if function_line:
+                if function_parens == 1:
+                    statement_errors.append(f"Line {function_line}: Incomplete function definition")
+                function_line = 0
+            if if_lines and if_lines[0] < line:
+                statement_errors.extend(_missing_then(if_lines, line))
+                if_lines = [if_line for if_line in if_lines if if_line == line]
+            line += 1
+            if newlines > 1 and if_lines:
+                # The line after the 'if' ended inside this token
+                statement_errors.extend(_missing_then(if_lines, line))
+                if_lines = []
+            line += newlines - 1
+        else:
+            line += newlines
+
+        if kind == 'lead':
+            if match.group(kind) == 'if':
+                if_lines.append(line)
+            else:
+                function_line = line
+                function_parens = 0
+
+    return _finish(errors, statement_errors, stack, line, if_lines, function_line, function_parens)
+
+
+def _missing_then(if_lines, line):
+    """Errors for pending 'if's whose following line has now been read."""
+    return [f"Line {if_line}: 'if' statement missing 'then'" for if_line in if_lines if if_line < line]
+
+
+def _finish(errors, statement_errors, stack, line, if_lines, function_line, function_parens):
+    """Shared end-of-script checks for the full and incremental scanners."""
+    if function_line and function_parens == 1:
+        statement_errors.append(f"Line {function_line}: Incomplete function definition")
+    # An 'if' on the very last line has no following line to look at
+    statement_errors.extend(_missing_then(if_lines, line))
+
+    if stack:
+        char, line_num = stack[-1]
+        errors.append(f"Line {line_num}: Unclosed '{char}'")
+
+    return errors + statement_errors
+
+
+# --- Incremental (line-by-line) scanning -------------------------------------
+#
+# The editor sends line-range edits, so a document keeps, for every line, the
+# lexer state it starts in and a small summary of what the line contains.
+# Lexer states carried from one line to the next:
+#   None                          plain code
+#   ('long', '==', 'comment')     inside a long comment/string closed by ]==]
+#   ('string', '"', skip_space)   inside a string continued with a trailing
+#                                 '\' (or '\z', which also skips whitespace)
+
+_EMPTY_LINE = (None, '', False, None, False)
+
+_LONG_OPEN_RE = re.compile(r'(?:--)?\[(=*)\[')
+_Z_TAIL_RE = re.compile(r'(?:^|[^\\])(?:\\\\)*\\z\s*$')
+_STRING_REST_RE = {
+    '"': re.compile(r'(?:[^"\\]|\\.)*(")?'),
+    "'": re.compile(r"(?:[^'\\]|\\.)*(')?"),
+}
+
+
+def scan_line(text, state=None):
+    """Lex one line (without its newline) starting in the given lexer state.
+
+    Returns ((lead, brackets, has_then, error, opens_long), end_state) where
+    lead is 'if'/'function'/None, brackets is the line's bracket characters
+    in order, error is a lexical error message or None and opens_long tells
+    whether a long bracket left open at the end of the line starts here.
+    """
+    pos = 0
+    lead = None
+    error = None
+    if state is None:
+        match = LEAD_RE.match(text)
+        if match:
+            lead = match.group(1)
+    elif state[0] == 'long':
+        close = ']' + state[1] + ']'
+        end = text.find(close)
+        if end < 0:
+            return _EMPTY_LINE, state
+        pos = end + len(close)
+        state = None
+    else:
+        quote, skip_space = state[1], state[2]
+        if skip_space:
+            pos = len(text) - len(text.lstrip())
+            if pos == len(text):
+                return _EMPTY_LINE, state
+        match = _STRING_REST_RE[quote].match(text, pos)
+        if match.group(1) is None:
+            state = _continued_string(text, quote, match.end(), match.group())
+            if state is not None:
+                return _EMPTY_LINE, state
+            return (None, '', False, 'unfinished string', False), None
+        pos = match.end()
+        state = None
+
+    brackets = []
+    has_then = False
+    opens_long = False
+    check_then = 'then' in text
+    for match in TOKEN_RE.finditer(text, pos):
+        kind = match.lastgroup
+        if check_then and not has_then and THEN_RE.search(text, match.start(), match.start(kind)):
+            has_then = True
+
+        if kind == 'open' or kind == 'close' or kind == 'bracket':
+            brackets.append(match.group(kind))
+        elif kind == 'end':
+            break
+        elif kind == 'open_string':
+            token = match.group(kind)
+            state = _continued_string(text, token[0], match.end(), token)
+            if state is None:
+                error = 'unfinished string'
+            break
+        elif kind == 'open_long_comment' or kind == 'open_long_string':
+            level = _LONG_OPEN_RE.match(match.group(kind)).group(1)
+            state = ('long', level, 'comment' if kind == 'open_long_comment' else 'string')
+            opens_long = True
+            break
+
+    return (lead, ''.join(brackets), has_then, error, opens_long), state
+
+
+def _continued_string(text, quote, body_end, body):
+    """Lexer state if an unclosed string on this line goes on to the next."""
+    if body_end == len(text) - 1 and text.endswith('\\'):
+        return ('string', quote, False)
+    if body_end == len(text) and _Z_TAIL_RE.search(body):
+        return ('string', quote, True)
+    return None
+
+
+def check_lines(infos, end_state=None):
+    """Run the same checks as find_syntax_errors over scan_line summaries.
+
+    infos[i] is the summary of line i + 1 and end_state the lexer state
+    after the last line.
+    """
+    errors = []
+    statement_errors = []
+    stack = []
+    if_lines = []
+    function_line = 0
+    function_parens = 0
+
+    last = len(infos)
+    unfinished = None
+    if end_state is not None:
+        if end_state[0] == 'long':
+            # Stop at the line that opened the long bracket, like a full
+            # scan does; lines after it are all inside the bracket
+            while last > 1 and not infos[last - 1][4]:
+                last -= 1
+            unfinished = f"Unfinished long {end_state[2]}"
+        else:
+            unfinished = "Unfinished string"
+
+    line = 1
+    for index in range(last):
+        lead, brackets, has_then, error, _ = infos[index]
+        line = index + 1
+        if lead == 'if':
+            if_lines.append(line)
+        elif lead == 'function':
+            function_line = line
+            function_parens = 0
+
+        skip = False
+        for char in brackets:
+            if char in '([{':
+                if not skip:
+                    stack.append((char, line))
+                if char == '(' and function_line:
+                    function_parens |= 1
+            else:
+                if not skip:
+                    if not stack or stack[-1][0] != _OPEN_FOR_CLOSE[char]:
+                        errors.append(f"Line {line}: Unmatched '{char}'")
+                        skip = True
+                    else:
+                        stack.pop()
+                if char == ')' and function_line:
+                    function_parens |= 2
+
+        if has_then:
+            if_lines = []
+        if error:
+            errors.append(f"Line {line}: {error.capitalize()}")
+
+        if index + 1 < last:
+            # End of this line: settle the per-line statement checks
+            if function_line:
+                if function_parens == 1:
+                    statement_errors.append(f"Line {function_line}: Incomplete function definition")
+                function_line = 0
+            if if_lines and if_lines[0] < line:
+                statement_errors.extend(_missing_then(if_lines, line))
+                if_lines = [if_line for if_line in if_lines if if_line == line]
+
+    if unfinished:
+        errors.append(f"Line {line}: {unfinished}")
+
+    return _finish(errors, statement_errors, stack, line, if_lines, function_line, function_parens)
+
+
+# Placeholder state for lines that have not been lexed yet; never equal to a
+# real state, so re-lexing always continues through them.
+_UNKNOWN = ('unknown',)
+
+
+class LuaDocument:
+    """A script held as lines, with per-line lexer results cached so that an
+    edit only re-lexes the changed lines (plus any lines whose starting state
+    changed, e.g. after opening a long comment)."""
+
+    def __init__(self, text=''):
+        self.lines = []
+        self.infos = []
+        self.states = []
+        self.end_state = None
+        self.replace_lines(0, 0, text.split('\n'))
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    def replace_lines(self, start, end, new_lines):
+        """Replace lines[start:end] with new_lines. Returns lines re-lexed."""
+        if not 0 <= start <= end <= len(self.lines):
+            raise ValueError(f"Edit range {start}-{end} is outside the document")
+        if len(self.lines) - (end - start) + len(new_lines) < 1:
+            raise ValueError("A document always has at least one line")
+
+        if start < len(self.states):
+            state = self.states[start]
+        else:
+            state = self.end_state if self.lines else None
+
+        count = len(new_lines)
+        self.lines[start:end] = new_lines
+        self.infos[start:end] = [None] * count
+        self.states[start:end] = [_UNKNOWN] * count
+
+        index = start
+        total = len(self.lines)
+        while index < total:
+            if index >= start + count and self.states[index] == state:
+                # Starting state unchanged, so the rest of the cache is valid
+                break
+            self.states[index] = state
+            self.infos[index], state = scan_line(self.lines[index], state)
+            index += 1
+        else:
+            self.end_state = state
+
+        return index - start
+
+    def errors(self):
+        """Heuristic syntax errors for the whole document."""
+        return check_lines(self.infos, self.end_state)
@@ -17,9 +17,21 @@ from urllib.request import urlopen
 from urllib.error import URLError
 
 
-def _run_server():
+def _start_server():
+    """Serve the app on a background thread; returns the waitress Server if one is used."""
     # Import the Flask app object and run it directly to avoid opening the OS browser
-    from main import app
+    import serving
+    from main import app, make_server
+    if not serving.WAITRESS_AVAILABLE:
+        threading.Thread(target=_run_server, args=(app,), daemon=True).start()
+        return None
+    print("[mac_app] Starting embedded server (waitress) on http://127.0.0.1:5001 ...")
+    server = make_server("127.0.0.1", 5001)
+    threading.Thread(target=server.run, daemon=True).start()
+    return server
+
+
+def _run_server(app):
     # Run the server on localhost:5001
     print("[mac_app] Starting embedded Flask server on http://127.0.0.1:5001 ...")
     # Disable reloader to avoid signal issues in threads
@@ -62,9 +74,9 @@ def main():
 
     # If something else already runs on 5001, just open the window and hope it's our app
     server_started_here = False
+    server = None
     if not _is_port_in_use("127.0.0.1", 5001):
-        t = threading.Thread(target=_run_server, daemon=True)
-        t.start()
+        server = _start_server()
         server_started_here = True
 
     # Wait a moment for server availability
@@ -100,6 +112,13 @@ def main():
     # Start the GUI (devtools disabled to avoid confusion)
     webview.start()
 
+    if server is not None:
+        # Let sandbox runs and execution jobs in progress finish
+        server.shutdown(wait=True)
+
 
 if __name__ == "__main__":
+    # Sandbox workers are spawned processes; needed for frozen executables
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -1,9 +1,25 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
 from flask_cors import CORS
+import argparse
+import atexit
+import json
+import multiprocessing
 import os
 import sys
+import tarfile
+import time
 from executor import RobloxExecutor
-from script_hub import ScriptHub
+from script_hub import create_script_hub
+from validation_sessions import ValidationSessions, ResyncRequired
+from streaming import StreamSlots, format_sse, stream_call
+from status_monitor import StatusMonitor
+from jobs import Deferred, JobQueue, QueueFull
+import config
+import http_cache
+import hub_archive
+import metrics
+import serving
+from profiler import Profiler
 
 def _resource_base() -> str:
     """Return base dir for resources; supports PyInstaller (_MEIPASS)."""
@@ -16,13 +32,59 @@ BASE_DIR = _resource_base()
 app = Flask(
     __name__,
     template_folder=os.path.join(BASE_DIR, "templates"),
-    static_folder=os.path.join(BASE_DIR, "static"),
+    static_folder=None,
 )
 CORS(app)
 
+profiler = Profiler()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profile_token = profiler.request_started()
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profiler.request_finished(g.pop('profile_token', None))
+
+def record_request(response):
+    """after_request hook: count and time the request by its route template"""
+    started = g.pop('request_started', None)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUESTS.inc(route, request.method, str(response.status_code))
+    if started is not None:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method)
+    return response
+
+# Hooks run in reverse order, so compression is included in the timing
+app.after_request(record_request)
+
+# Static files are served from memory with ETags and precompressed variants
+static_assets = http_cache.StaticAssets(os.path.join(BASE_DIR, "static"))
+app.add_url_rule('/static/<path:filename>', endpoint='static', view_func=static_assets.serve)
+app.url_defaults(static_assets.url_defaults)
+app.after_request(http_cache.compress_response)
+
 # Initialize backend
 executor = RobloxExecutor()
-script_hub = ScriptHub()
+script_hub = create_script_hub()
+validation_sessions = ValidationSessions(executor)
+job_queue = JobQueue()
+status_monitor = StatusMonitor(executor)
+# Unlimited under the development server, which has a thread per connection
+stream_slots = StreamSlots()
+
+if executor.sandbox:
+    atexit.register(executor.sandbox.shutdown)
+atexit.register(executor.execution_log.close)
+atexit.register(executor.history.close)
+
+if config.PROFILE_MODE:
+    try:
+        profiler.start(config.PROFILE_MODE, seconds=config.PROFILE_SECONDS)
+    except ValueError as e:
+        print(f"Ignoring SYNAPSE_PROFILE: {e}")
+atexit.register(profiler.stop)
 
 @app.route('/')
 def index():
@@ -33,6 +95,7 @@ def index():
 def inject():
     """Inject into Roblox process"""
     success, message = executor.inject()
+    status_monitor.refresh()
     return jsonify({
         'success': success,
         'message': message,
@@ -41,15 +104,51 @@ def inject():
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Get injection status"""
-    return jsonify({
-        'injected': executor.is_injected(),
-        'info': executor.get_roblox_info()
-    })
+    """Get injection status (as last sampled by the status monitor)"""
+    return jsonify(status_monitor.current())
+
+@app.route('/api/status/stream', methods=['GET'])
+def status_stream():
+    """Push injection status changes as Server-Sent Events
+    
+    The stream ends after STATUS_STREAM_SECONDS and EventSource reconnects,
+    so stream slots turn over; with none free the answer is 503 and the
+    page polls /api/status instead.
+    """
+    if not stream_slots.acquire():
+        response = jsonify({
+            'success': False,
+            'message': 'Too many open status streams; poll /api/status instead'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    
+    ends_at = time.monotonic() + config.STATUS_STREAM_SECONDS
+    
+    def events():
+        keepalive = min(config.STATUS_KEEPALIVE, config.STATUS_STREAM_SECONDS)
+        for state in status_monitor.subscribe(keepalive):
+            if state is None:
+                # Comment line; lets us notice clients that went away
+                yield ": keepalive\n\n"
+            else:
+                yield format_sse(state, 'status')
+            if time.monotonic() >= ends_at:
+                return
+    
+    response = Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs however the response ends, even if the stream never started
+    response.call_on_close(stream_slots.release)
+    return response
 
 @app.route('/api/execute', methods=['POST'])
 def execute():
-    """Execute a script"""
+    """Queue a script for execution; poll /api/jobs/<job_id> for the result"""
     data = request.get_json()
     script = data.get('script', '')
     
@@ -65,17 +164,161 @@ def execute():
             'message': 'Script is empty'
         })
     
-    success, message = executor.execute(script)
+    try:
+        job = job_queue.submit(profiler.wrap(lambda: run_execution(script)))
+    except QueueFull as e:
+        return jsonify({
+            'success': False,
+            'message': f'Executor is busy, try again shortly ({e})'
+        }), 503
+    
     return jsonify({
-        'success': success,
-        'message': message
+        'success': True,
+        'job_id': job.id,
+        'status': job.status
+    }), 202
+
+def run_execution(script):
+    """Job steps for /api/execute; the simulated run time is a timer, not a sleep"""
+    success, plan = executor.prepare_execution(script)
+    if not success:
+        return {'success': False, 'message': plan}
+    
+    def finish():
+        success, message = executor.finish_execution(plan)
+        return {'success': success, 'message': message}
+    
+    return Deferred(plan['delay'], profiler.wrap(finish))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a job's status and result; ?wait=N long-polls up to N seconds
+    
+    With no stream slot free the job is returned at once, with Retry-After
+    telling the client when to poll again.
+    """
+    wait = min(max(request.args.get('wait', 0, type=float), 0), 30)
+    held = wait > 0 and stream_slots.acquire()
+    try:
+        job = job_queue.get(job_id, wait if held else 0)
+    finally:
+        if held:
+            stream_slots.release()
+    
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Unknown or expired job'
+        }), 404
+    
+    response = jsonify(job.to_dict())
+    if wait > 0 and not held and job.status != 'done':
+        response.headers['Retry-After'] = '1'
+    return response
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    """Page through execution records, newest first
+    
+    Optional filters: ?since= and ?until= (Unix times), ?hash= (script hash
+    or a prefix of it). Pass next_cursor back as ?cursor= for the next page.
+    """
+    script_hash = request.args.get('hash', '').strip().lower() or None
+    if script_hash and not all(c in '0123456789abcdef' for c in script_hash):
+        return jsonify({
+            'success': False,
+            'message': 'hash must be hexadecimal'
+        }), 400
+    
+    runs, next_cursor = executor.history.query(
+        limit=request.args.get('limit', type=int),
+        cursor=request.args.get('cursor', type=int),
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+        script_hash=script_hash,
+    )
+    return jsonify({
+        'success': True,
+        'runs': runs,
+        'next_cursor': next_cursor
     })
 
 @app.route('/api/scripts', methods=['GET'])
 def get_scripts():
-    """Get all scripts from the hub"""
-    scripts = script_hub.get_all_scripts()
-    return jsonify(scripts)
+    """List hub scripts (metadata only), a page at a time
+    
+    ?cursor= continues after the given script id; ?limit= sets the page size.
+    The response is streamed: {"scripts": [...], "next_cursor": id or null}
+    """
+    cursor = request.args.get('cursor') or None
+    limit = script_hub.page_size(request.args.get('limit', type=int))
+    etag = http_cache.make_etag('scripts', script_hub.state_token(), cursor, limit)
+    if http_cache.etag_matches(etag):
+        return http_cache.not_modified(etag)
+    
+    items = script_hub.iter_scripts(cursor)
+    
+    def generate():
+        yield '{"scripts": ['
+        next_cursor = None
+        for count, item in enumerate(items):
+            if count == limit:
+                next_cursor = last_id
+                break
+            yield (',' if count else '') + json.dumps(item)
+            last_id = item['id']
+        yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+    
+    headers = {'Vary': 'Accept-Encoding'}
+    body = generate()
+    if http_cache.negotiate_encoding(allow_br=False) == 'gzip':
+        body = http_cache.gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    headers['ETag'] = http_cache.encoded_etag(etag, headers.get('Content-Encoding'))
+    return Response(body, mimetype='application/json', headers=headers)
+
+@app.route('/api/scripts/search', methods=['GET'])
+def search_scripts():
+    """Search hub scripts by name, description and content
+    
+    ?q= is the query (every word must match); ?limit= caps the results.
+    """
+    query = request.args.get('q', '').strip()
+    limit = script_hub.page_size(request.args.get('limit', type=int))
+    if not query:
+        return jsonify({
+            'success': False,
+            'message': 'Search query is empty'
+        }), 400
+    
+    etag = http_cache.make_etag('search', script_hub.state_token(), query, limit)
+    if http_cache.etag_matches(etag):
+        return http_cache.not_modified(etag)
+    
+    response = jsonify({
+        'query': query,
+        'scripts': script_hub.search_scripts(query, limit)
+    })
+    response.headers['ETag'] = etag
+    return response
+
+@app.route('/api/scripts/<script_id>', methods=['GET'])
+def get_script(script_id):
+    """Get one hub script, including its content"""
+    etag = http_cache.make_etag('script', script_hub.state_token(), script_id)
+    if http_cache.etag_matches(etag):
+        return http_cache.not_modified(etag)
+    
+    script = script_hub.get_script(script_id)
+    if script is None:
+        return jsonify({
+            'success': False,
+            'message': 'Script not found'
+        }), 404
+    
+    response = jsonify(script)
+    response.headers['ETag'] = etag
+    return response
 
 @app.route('/api/scripts/save', methods=['POST'])
 def save_script():
@@ -97,6 +340,32 @@ def save_script():
         'message': 'Script saved successfully' if success else 'Failed to save script'
     })
 
+@app.route('/api/hub/export', methods=['GET'])
+def export_hub():
+    """Download every hub script as a .tar.gz, streamed as it is built"""
+    body = http_cache.gzip_stream(hub_archive.export_archive(script_hub))
+    filename = time.strftime('synapse-hub-%Y%m%d-%H%M%S.tar.gz')
+    return Response(body, mimetype='application/gzip', headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+@app.route('/api/hub/import', methods=['POST'])
+def import_hub():
+    """Add the scripts in a tar (or .tar.gz) request body to the hub"""
+    try:
+        counts = hub_archive.import_archive(script_hub, request.stream)
+    except (tarfile.TarError, EOFError, OSError) as e:
+        return jsonify({
+            'success': False,
+            'message': f"Invalid archive: {str(e)}"
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': f"Imported {counts['imported']} scripts",
+        **counts
+    })
+
 @app.route('/api/test', methods=['POST'])
 def test_script():
     """Test a script locally using Lua interpreter"""
@@ -116,27 +385,268 @@ def test_script():
         'console_output': console_output
     })
 
+@app.route('/api/test/stream', methods=['POST'])
+def test_script_stream():
+    """Test a script locally, streaming console output as Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    script = data.get('script', '')
+    
+    def run(emit):
+        if not script.strip():
+            return {'success': False, 'message': 'Script is empty'}
+        success, message, console_output = executor.test_script_locally(script, on_output=emit)
+        return {
+            'success': success,
+            'message': message,
+            'console_output': console_output
+        }
+    
+    return Response(
+        stream_call(profiler.wrap(run)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/test/batch', methods=['POST'])
+def test_batch():
+    """Test many scripts at once; without a script list, test the whole hub"""
+    data = request.get_json(silent=True) or {}
+    scripts = data.get('scripts')
+    
+    if scripts is None:
+        scripts = hub_scripts()
+    elif not isinstance(scripts, dict):
+        return jsonify({
+            'success': False,
+            'message': 'scripts must map names to script content'
+        })
+    
+    timeout = data.get('timeout')
+    if timeout is not None:
+        try:
+            timeout = float(timeout)
+        except (TypeError, ValueError):
+            timeout = None
+        if timeout is None or not 0 < timeout < float('inf'):
+            return jsonify({
+                'success': False,
+                'message': 'timeout must be a positive number of seconds'
+            }), 400
+    
+    started = time.perf_counter()
+    results = executor.test_scripts_locally(
+        {str(name): str(content) for name, content in scripts.items()},
+        timeout
+    )
+    passed = sum(1 for success, _, _ in results.values() if success)
+    return jsonify({
+        'success': passed == len(results),
+        'passed': passed,
+        'failed': len(results) - passed,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        'results': [
+            {
+                'name': name,
+                'success': success,
+                'message': message,
+                'console_output': console_output
+            }
+            for name, (success, message, console_output) in results.items()
+        ]
+    })
+
+def hub_scripts():
+    """Return name -> content for every script in the hub"""
+    return {name: info['content'] for name, info in script_hub.get_all_scripts().items()}
+
+@app.route('/api/validate', methods=['POST'])
+def validate_script():
+    """Validate editor changes incrementally for as-you-type feedback"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({
+            'success': False,
+            'message': 'Expected a JSON object'
+        }), 400
+    session_id = str(data.get('session', ''))
+    
+    if not session_id:
+        return jsonify({
+            'success': False,
+            'message': 'Session is required'
+        })
+    
+    try:
+        result = validation_sessions.validate(
+            session_id,
+            data.get('version'),
+            text=data.get('text'),
+            edits=data.get('edits'),
+            base_version=data.get('base_version'),
+        )
+    except ResyncRequired as e:
+        return jsonify({
+            'success': False,
+            'resync': True,
+            'message': str(e)
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    result['success'] = True
+    return jsonify(result)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request and phase metrics in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profile', methods=['GET'])
+def get_profile():
+    """Status of the profiler and the last file it wrote"""
+    return jsonify(profiler.status())
+
+@app.route('/api/profile/start', methods=['POST'])
+def start_profile():
+    """Start profiling: {"mode": "sample" | "cprofile", "fraction", "interval", "seconds"}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        status = profiler.start(
+            data.get('mode', 'sample'),
+            fraction=data.get('fraction'),
+            interval=data.get('interval'),
+            seconds=data.get('seconds'),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    return jsonify({'success': True, **status})
+
+@app.route('/api/profile/stop', methods=['POST'])
+def stop_profile():
+    """Stop profiling and write the results under logs/"""
+    path = profiler.stop()
+    return jsonify({
+        'success': True,
+        'file': path,
+        'message': f"Profile written to {path}" if path else 'Nothing was recorded'
+    })
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get cache and sandbox pool counters"""
+    return jsonify({
+        'validation_cache': executor.validation_cache.stats(),
+        'runtime_pool': executor.runtime_pool.stats() if executor.runtime_pool else None,
+        'sandbox': executor.sandbox.stats() if executor.sandbox else None,
+        'validation_sessions': validation_sessions.stats(),
+        'jobs': job_queue.stats(),
+        'status_monitor': status_monitor.stats(),
+        'stream_slots': stream_slots.stats(),
+        'processes': executor.processes.stats(),
+        'execution_log': executor.execution_log.stats(),
+        'history': executor.history.stats(),
+        'static_assets': static_assets.stats(),
+        'script_hub': script_hub.stats()
+    })
+
+def run_hub_tests():
+    """Test every Script Hub script locally and print a summary; returns an exit code"""
+    scripts = hub_scripts()
+    started = time.perf_counter()
+    results = executor.test_scripts_locally(scripts)
+    elapsed = time.perf_counter() - started
+    
+    failed = 0
+    for name, (success, message, _) in results.items():
+        if success:
+            print(f"PASS  {name}")
+        else:
+            failed += 1
+            print(f"FAIL  {name}")
+            print("\n".join(f"      {line}" for line in message.splitlines()))
+    
+    print(f"\n{len(results) - failed} passed, {failed} failed in {elapsed:.2f}s")
+    return 1 if failed else 0
+
+def drain_work(timeout):
+    """Graceful shutdown: refuse new sandbox runs and jobs and let those in progress finish"""
+    deadline = time.monotonic() + timeout
+    if executor.sandbox and not executor.sandbox.shutdown(wait=timeout):
+        print("Stopping with sandbox runs still in progress")
+    if not job_queue.close(max(0.0, deadline - time.monotonic())):
+        print("Stopping with execution jobs still pending")
+
+def make_server(host, port, threads=None, backlog=None, keepalive=None):
+    """A waitress server for the app, with stream slots sized to its threads"""
+    server = serving.Server(
+        app, host, port, threads=threads, backlog=backlog, keepalive=keepalive, drain=drain_work,
+    )
+    # Leave threads free for ordinary requests however many tabs are open
+    stream_slots.limit = config.SERVE_STREAM_SLOTS or max(1, server.threads // 2)
+    return server
+
 def main():
     """Main entry point for the application"""
+    parser = argparse.ArgumentParser(description="SynapseAI Executor - Web Edition")
+    parser.add_argument('--test-hub', action='store_true',
+                        help="test every Script Hub script locally and exit")
+    parser.add_argument('--port', type=int, default=5001,
+                        help="port to serve on (default: 5001)")
+    parser.add_argument('--no-browser', action='store_true',
+                        help="don't open the app in a browser")
+    parser.add_argument('--serve', action='store_true',
+                        help="serve with the multi-threaded waitress server instead of "
+                             "Flask's development server")
+    parser.add_argument('--threads', type=int,
+                        help=f"--serve worker threads (default: {config.SERVE_THREADS})")
+    parser.add_argument('--backlog', type=int,
+                        help=f"--serve listen backlog (default: {config.SERVE_BACKLOG})")
+    parser.add_argument('--keepalive', type=float,
+                        help=f"--serve idle keep-alive timeout in seconds (default: {config.SERVE_KEEPALIVE:g})")
+    args = parser.parse_args()
+    
+    if args.test_hub:
+        sys.exit(run_hub_tests())
+    
+    if args.serve and not serving.WAITRESS_AVAILABLE:
+        print("❌ --serve needs waitress: pip install waitress")
+        sys.exit(1)
+    
+    url = f"http://localhost:{args.port}"
     print("\n" + "="*60)
     print("🚀 SynapseAI Executor - Web Edition")
     print("="*60)
-    print("\n📱 Opening in your browser at: http://localhost:5001")
+    print(f"\n📱 Opening in your browser at: {url}")
     print("\n⚠️  Make sure Roblox is running before injecting!")
     print("\n🛑 Press CTRL+C to stop the server\n")
     print("="*60 + "\n")
     
-    # Open browser automatically
-    import webbrowser
-    import threading
-    def open_browser():
-        import time
-        time.sleep(1.5)
-        webbrowser.open('http://localhost:5001')
-    
-    threading.Thread(target=open_browser).start()
+    if not args.no_browser:
+        # Open browser automatically
+        import webbrowser
+        import threading
+        def open_browser():
+            import time
+            time.sleep(1.5)
+            webbrowser.open(url)
+        
+        threading.Thread(target=open_browser).start()
     
-    app.run(debug=False, port=5001, host='127.0.0.1')
+    if args.serve:
+        make_server(
+            '127.0.0.1', args.port, threads=args.threads, backlog=args.backlog, keepalive=args.keepalive,
+        ).run()
+    else:
+        app.run(debug=False, port=args.port, host='127.0.0.1')
 
 if __name__ == '__main__':
+    # Sandbox workers are spawned processes; needed for frozen executables
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,178 @@
+"""
+Request and phase metrics, exposed in Prometheus text format at /api/metrics.
+
+Counters and histograms are plain in-process objects: an observation is a
+bisect into the bucket bounds and a few additions under a lock, cheap
+enough to leave on for every request. Series are keyed by label values, so
+label sets must stay small (route templates, not raw paths).
+
+Phases timed across the app:
+
+    validate       RobloxExecutor.validate_lua_syntax (cache hits included)
+    sandbox_setup  getting a runtime or worker and a fresh environment
+    script_run     running a script in the sandbox
+    hub_scan       ScriptHub directory scans
+    hub_read       Script Hub content read from disk (cache misses)
+    log_write      execution log and history batches written to disk
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+import config
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        if not config.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Bucketed distribution (plus sum and count) per label set.
+
+    buckets -- upper bounds in ascending order; +Inf is added implicitly
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not config.METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        """Context manager observing the seconds spent in its with block."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield (
+                    self.name + '_bucket',
+                    _format_labels(self.labelnames, labels, ('le', _format_value(float(bound)))),
+                    cumulative,
+                )
+            yield self.name + '_sum', _format_labels(self.labelnames, labels), total
+            yield self.name + '_count', _format_labels(self.labelnames, labels), cumulative
+
+
+class _Timer:
+    # A plain class rather than @contextmanager: this is on every hot path
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'synapse_http_requests_total', "HTTP requests handled.", ('route', 'method', 'status')
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'synapse_http_request_duration_seconds',
+    "Time to build an HTTP response (streamed bodies excluded).", ('route', 'method')
+))
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    'synapse_phase_duration_seconds', "Time spent in each phase of request handling.", ('phase',)
+))
+VALIDATIONS = REGISTRY.register(Counter(
+    'synapse_validations_total', "Syntax validations by result.", ('result',)
+))
+
+
+def phase(name):
+    """Context manager timing one phase into PHASE_SECONDS."""
+    return PHASE_SECONDS.time(name)
@@ -0,0 +1,121 @@
+"""
+Cached view of the running processes for Roblox discovery and status.
+
+psutil.process_iter() opens every process on every call. The registry instead
+lists pids (a single cheap call), reads the name of new pids only and keeps
+per-process attributes for a short TTL, reading them in one oneshot() batch.
+A listed pid may since have been reused by another process, so the few
+processes handed out by find() have their create time checked once per
+scan.
+"""
+
+import threading
+import time
+
+import psutil
+
+import config
+
+
+class ProcessRegistry:
+    """Incrementally refreshed pid -> name map plus TTL-cached process info.
+
+    ttl -- seconds a pid scan or an info snapshot is reused
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = config.PROCESS_CACHE_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._processes = {}  # pid -> (psutil.Process, name)
+        self._watched = set() # pids handed out, checked for reuse on each scan
+        self._scanned_at = None
+        self._info = {}       # pid -> (read_at, info dict)
+        self._stats = {'scans': 0, 'name_reads': 0, 'info_reads': 0, 'info_hits': 0, 'reused_pids': 0}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._scanned_at is not None and now - self._scanned_at < self.ttl:
+            return
+        self._scanned_at = now
+        self._stats['scans'] += 1
+
+        pids = set(psutil.pids())
+        for pid in self._processes.keys() - pids:
+            del self._processes[pid]
+            self._info.pop(pid, None)
+        self._watched &= pids
+
+        # A listed pid is never re-read, so check that the processes handed
+        # out are still the ones behind their pids (is_running() compares
+        # create times); a reused pid is read again as a new process
+        reused = set()
+        for pid in self._watched:
+            if not self._processes[pid][0].is_running():
+                del self._processes[pid]
+                self._info.pop(pid, None)
+                reused.add(pid)
+        self._watched -= reused
+        self._stats['reused_pids'] += len(reused)
+
+        for pid in pids - self._processes.keys():
+            try:
+                proc = psutil.Process(pid)
+                name = proc.name()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            self._stats['name_reads'] += 1
+            self._processes[pid] = (proc, name)
+
+    def find(self, match):
+        """Return the psutil.Process objects whose name satisfies match(name)."""
+        with self._lock:
+            self._refresh()
+            found = [proc for proc, name in self._processes.values() if name and match(name)]
+            self._watched.update(proc.pid for proc in found)
+        return found
+
+    def is_running(self, proc):
+        """Whether proc still runs, as of the last scan (at most ttl old)."""
+        with self._lock:
+            self._refresh()
+            known = self._processes.get(proc.pid)
+            if known is not None and known[0] is not proc:
+                # Not from find(): watch it so a reuse of its pid is noticed
+                self._watched.add(proc.pid)
+        # psutil compares pid and create time, both read when proc was made
+        return known is not None and known[0] == proc
+
+    def info(self, proc):
+        """Return {'pid', 'name', 'status', 'memory'} for proc, or None if it is gone."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._info.get(proc.pid)
+            if cached is not None and now - cached[0] < self.ttl:
+                self._stats['info_hits'] += 1
+                return dict(cached[1])
+
+        try:
+            # One batched read of everything the status view shows
+            with proc.oneshot():
+                info = {
+                    'pid': proc.pid,
+                    'name': proc.name(),
+                    'status': proc.status(),
+                    'memory': proc.memory_info().rss / 1024 / 1024  # MB
+                }
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            with self._lock:
+                self._info.pop(proc.pid, None)
+            return None
+
+        with self._lock:
+            self._stats['info_reads'] += 1
+            self._info[proc.pid] = (now, info)
+        return dict(info)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['processes'] = len(self._processes)
+        stats['ttl'] = self.ttl
+        return stats
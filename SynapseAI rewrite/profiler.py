@@ -0,0 +1,255 @@
+"""
+Opt-in profiling of the running server (SYNAPSE_PROFILE or /api/profile).
+
+Two modes, both hooked in per request by main.py. Work a request hands to
+another thread (a streamed test, an execute job's steps) is wrapped with
+Profiler.wrap() so it is covered too:
+
+    sample    a background thread snapshots the stacks of threads that are
+              serving requests or wrapped work every interval and counts
+              them; the result
+              is written as collapsed stacks ("a;b;c 12" per line), ready
+              for flamegraph.pl or speedscope.
+    cprofile  a fraction of requests and wrapped calls run under cProfile;
+              their stats are merged and written as a .pstats file for
+              pstats/snakeviz.
+
+Either way everything a request calls is covered, including
+RobloxExecutor.validate_lua_syntax, test_script_locally and the ScriptHub
+methods; scripts running in sandbox worker processes are not. Only one
+request is under cProfile at a time, since Python allows only one active
+profiler. Results go to logs/profile-<time>.<ext> when the session stops.
+"""
+
+import cProfile
+import functools
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+
+MODES = ('sample', 'cprofile')
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _SamplingSession:
+    extension = 'collapsed'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = Counter()  # thread id -> requests in progress
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="synapse-profiler", daemon=True)
+        self._thread.start()
+
+    def request_started(self):
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+        return threading.get_ident()
+
+    def request_finished(self, ident):
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = set(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if labels:
+                    with self._lock:
+                        self.stacks[';'.join(reversed(labels))] += 1
+                        self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        if not self.stacks:
+            return False
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {'samples': self.samples, 'stacks': len(self.stacks), 'interval': self.interval}
+
+
+class _CProfileSession:
+    extension = 'pstats'
+
+    def __init__(self, fraction):
+        self.fraction = fraction
+        self.profiled = 0
+        self.skipped = 0
+        self._stats = None
+        self._active = threading.Lock()  # held while a request is profiled
+        self._lock = threading.Lock()
+
+    def request_started(self):
+        if random.random() >= self.fraction:
+            return None
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Some other profiler is active in this process
+            self._active.release()
+            return None
+        return profile
+
+    def request_finished(self, profile):
+        profile.disable()
+        self._active.release()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.profiled += 1
+
+    def stop(self):
+        # A request still being profiled (perhaps the one stopping the
+        # session) is left out rather than waited for
+        self.fraction = 0
+
+    def write(self, path):
+        with self._lock:
+            if self._stats is None:
+                return False
+            self._stats.dump_stats(path)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {'profiled': self.profiled, 'skipped': self.skipped, 'fraction': self.fraction}
+
+
+class Profiler:
+    """Starts and stops profiling sessions and hooks them into requests."""
+
+    def __init__(self, log_dir="logs"):
+        self.log_dir = log_dir
+        self.mode = None
+        self.started = None
+        self.last_result = None
+        self._session = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def start(self, mode, fraction=None, interval=None, seconds=None):
+        """Start a session; it stops after seconds if given. Raises ValueError."""
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+        if seconds is not None:
+            try:
+                seconds = float(seconds)
+            except (TypeError, ValueError):
+                seconds = -1.0
+            if not 0 <= seconds < float('inf'):
+                raise ValueError("seconds must be a non-negative number")
+        with self._lock:
+            if self._session is not None:
+                raise ValueError(f"a {self.mode} session is already running")
+            if mode == 'sample':
+                interval = interval or config.PROFILE_INTERVAL
+                if interval <= 0:
+                    raise ValueError("interval must be positive")
+                self._session = _SamplingSession(interval)
+            else:
+                fraction = config.PROFILE_FRACTION if fraction is None else fraction
+                if not 0 < fraction <= 1:
+                    raise ValueError("fraction must be in (0, 1]")
+                self._session = _CProfileSession(fraction)
+            self.mode = mode
+            self.started = time.time()
+            if seconds:
+                self._timer = threading.Timer(seconds, self.stop)
+                self._timer.daemon = True
+                self._timer.start()
+        return self.status()
+
+    def stop(self):
+        """Stop the running session; returns the file written, if any."""
+        with self._lock:
+            session, self._session = self._session, None
+            timer, self._timer = self._timer, None
+            mode, self.mode = self.mode, None
+        if session is None:
+            return None
+        if timer is not None:
+            timer.cancel()
+        session.stop()
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        path = os.path.join(
+            self.log_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{mode}.{session.extension}"
+        )
+        written = session.write(path)
+        self.last_result = path if written else None
+        return self.last_result
+
+    def request_started(self):
+        """before_request hook; returns a token for request_finished"""
+        session = self._session
+        if session is None:
+            return None
+        token = session.request_started()
+        return (session, token) if token is not None else None
+
+    def request_finished(self, token):
+        if token is not None:
+            session, token = token
+            session.request_finished(token)
+
+    def wrap(self, func):
+        """func, profiled like a request when it runs on another thread"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = self.request_started()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.request_finished(token)
+        return wrapper
+
+    def status(self):
+        with self._lock:
+            session = self._session
+            status = {
+                'running': session is not None,
+                'mode': self.mode,
+                'started': self.started if session is not None else None,
+                'last_result': self.last_result,
+            }
+        if session is not None:
+            status.update(session.stats())
+        return status
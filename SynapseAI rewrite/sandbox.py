@@ -0,0 +1,777 @@
+"""
+Local Lua sandbox used by RobloxExecutor.test_script_locally.
+
+Creating a LuaRuntime and loading the mock Roblox API is most of the cost of
+a local test, so runtimes are created once, kept warm in a bounded pool and
+handed out per run. Every run gets a fresh global environment table, which
+keeps scripts from leaking globals into each other, and runtimes are retired
+after a configurable number of runs.
+
+Each run is limited to an instruction count and a wall-clock time, enforced
+by a Lua count hook; a script over budget is aborted and its runtime retired.
+
+Runs are normally sent to a pool of worker processes (SandboxProcessPool),
+each holding its own warm runtime, so scripts never execute on a web server
+thread; setting SYNAPSE_SANDBOX_WORKERS=0 runs them in-process instead.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import config
+import metrics
+
+try:
+    from lupa import LuaError, LuaRuntime
+    LUA_AVAILABLE = True
+except ImportError:
+    LUA_AVAILABLE = False
+
+
+# Loaded once per runtime. Builds a read-only base of the standard globals and
+# a factory that returns a brand-new environment (with fresh mock objects, its
+# own copies of the standard library tables and its own console buffer) for
+# every script run. Printed lines are collected in a Lua table and handed to a
+# Python sink in batches joined by table.concat, so a chatty script costs one
+# Python call per batch rather than per line.
+SANDBOX_PRELUDE = """
+local clock = ...
+
+-- 'debug' stays out of reach so scripts cannot remove the budget hook, and
+-- 'package' with it, since package.loaded leads back to the real globals
+local base = {}
+for k, v in pairs(_G) do
+    if k ~= "python" and k ~= "_G" and k ~= "debug" and k ~= "package" then
+        base[k] = v
+    end
+end
+
+-- Protected metatables: a script can neither reach base through its env nor
+-- change the tables shared by every run on this runtime (strings and files
+-- index their library tables through theirs)
+local base_meta = {__index = base, __metatable = false}
+getmetatable("").__metatable = false
+if io and io.stdout then
+    getmetatable(io.stdout).__metatable = false
+end
+
+local tostring, select, setmetatable, load, loadfile = tostring, select, setmetatable, load, loadfile
+local type, error, pairs = type, error, pairs
+local table_pack, table_unpack = table.pack, table.unpack
+local co_create, co_resume, co_status = coroutine.create, coroutine.resume, coroutine.status
+local sethook, traceback = debug.sethook, debug.traceback
+local concat = table.concat
+
+-- Instructions between budget checks
+local HOOK_INTERVAL = 10000
+
+-- Printed lines are flushed to the sink once this many are buffered, or once
+-- the oldest buffered line is this many seconds old
+local FLUSH_LINES = 256
+local FLUSH_SECONDS = 0.05
+
+-- env -> console flush function, for _synapse_run
+local console_of = setmetatable({}, {__mode = "k"})
+
+-- Budget hook of the run in progress; coroutines created by the script get
+-- it too, or they would run unmetered
+local current_hook = nil
+local co_lib = {}
+for k, v in pairs(coroutine) do
+    co_lib[k] = v
+end
+co_lib.create = function(f)
+    local co = co_create(f)
+    if current_hook then
+        sethook(co, current_hook, "", HOOK_INTERVAL)
+    end
+    return co
+end
+co_lib.wrap = function(f)
+    local co = co_lib.create(f)
+    return function(...)
+        local results = table_pack(co_resume(co, ...))
+        if not results[1] then
+            error(results[2], 0)
+        end
+        return table_unpack(results, 2, results.n)
+    end
+end
+base.coroutine = co_lib
+
+-- Lua runs message handlers with hooks disabled, so a looping handler could
+-- never be stopped. Call the handler after the protected call instead; only
+-- the stack it could inspect (through the hidden debug library) differs.
+local pcall = pcall
+base.xpcall = function(f, msgh, ...)
+    local results = table_pack(pcall(f, ...))
+    if results[1] then
+        return table_unpack(results, 1, results.n)
+    end
+    return false, msgh(results[2])
+end
+
+function _synapse_new_env(sink)
+    local env = setmetatable({}, base_meta)
+    local lines, count, first_at = {}, 0, 0
+    local parts = {}
+    local printing = false
+    env._G = env
+
+    -- Shallow copies of the library tables, so string.x = 1 stays in this run
+    local libs = {}
+    for name, lib in pairs(base) do
+        if type(lib) == "table" then
+            local copy = {}
+            for k, v in pairs(lib) do
+                copy[k] = v
+            end
+            libs[name] = copy
+            env[name] = copy
+        end
+    end
+
+    -- Chunks loaded by the script get this env, never the runtime's globals,
+    -- and only as source: crafted bytecode could break out of the sandbox
+    env.load = function(chunk, chunkname, mode, chunk_env)
+        return load(chunk, chunkname, "t", chunk_env or env)
+    end
+    if base.loadstring then
+        env.loadstring = function(source, chunkname)
+            return load(source, chunkname, "t", env)
+        end
+    end
+    env.loadfile = function(filename, mode, chunk_env)
+        return loadfile(filename, "t", chunk_env or env)
+    end
+    env.dofile = function(filename)
+        local chunk, err = env.loadfile(filename)
+        if not chunk then
+            error(err, 2)
+        end
+        return chunk()
+    end
+    env.require = function(name)
+        local lib = libs[name]
+        if lib == nil then
+            error("module '" .. tostring(name) .. "' not found (only the standard libraries are available)", 2)
+        end
+        return lib
+    end
+
+    -- Pass buffered lines to the sink; without now, flush unconditionally.
+    -- The budget hook passes now and can fire mid-print, so it backs off
+    -- while print is updating the buffer.
+    local function flush(now)
+        if count == 0 or (now and (printing or count < FLUSH_LINES and now - first_at < FLUSH_SECONDS)) then
+            return
+        end
+        local chunk = concat(lines, "\\n", 1, count)
+        lines, count = {}, 0
+        sink(chunk)
+    end
+    console_of[env] = flush
+
+    -- Capture print output instead of writing to the server's stdout
+    env.print = function(...)
+        printing = true
+        local n = select("#", ...)
+        for i = 1, n do
+            parts[i] = tostring((select(i, ...)))
+        end
+        if count == 0 then
+            first_at = clock()
+        end
+        count = count + 1
+        lines[count] = concat(parts, "\\t", 1, n)
+        if count >= FLUSH_LINES then
+            flush()
+        end
+        printing = false
+    end
+
+    -- Mock Roblox game object
+    env.game = {
+        GetService = function(self, service)
+            return {
+                _name = service,
+                SetCore = function() end,
+            }
+        end,
+    }
+
+    -- Mock workspace
+    env.workspace = {
+        _name = "Workspace",
+    }
+
+    -- Mock wait function
+    env.wait = function(duration)
+        return duration or 0
+    end
+
+    -- Mock spawn function
+    env.spawn = function(func)
+        func()
+    end
+
+    -- Mock Instance
+    env.Instance = {
+        new = function(className)
+            return {
+                _className = className,
+                Name = "MockInstance",
+            }
+        end
+    }
+
+    return env
+end
+
+function _synapse_compile(source)
+    local chunk, err = load(source, "=script", "t", {})
+    if chunk then
+        return nil
+    end
+    return err
+end
+
+-- Runs source in env on its own coroutine with a count hook enforcing the
+-- budgets. Returns nil on success, or (error, exceeded) where exceeded is
+-- "instructions" or "time" when a budget stopped the script.
+function _synapse_run(env, source, max_instructions, max_seconds)
+    local chunk, err = load(source, "=script", "t", env)
+    if not chunk then
+        return err
+    end
+
+    local flush = console_of[env]
+    local executed = 0
+    local deadline = clock() + max_seconds
+    local exceeded = nil
+    local hook
+
+    hook = function()
+        if not exceeded then
+            executed = executed + HOOK_INTERVAL
+            local now = clock()
+            if executed > max_instructions then
+                exceeded = "instructions"
+            elseif now > deadline then
+                exceeded = "time"
+            else
+                -- Lines printed just before a long computation still stream
+                flush(now)
+                return
+            end
+        end
+        -- From now on fail on every instruction, so a pcall in the script
+        -- cannot swallow the abort and keep going
+        sethook(hook, "", 1)
+        error("budget exceeded", 0)
+    end
+
+    current_hook = hook
+    local main = co_create(chunk)
+    sethook(main, hook, "", HOOK_INTERVAL)
+    local ok, result = co_resume(main)
+    current_hook = nil
+    flush()
+    if exceeded then
+        return "budget exceeded", exceeded
+    end
+    if not ok then
+        if type(result) == "string" then
+            return traceback(main, result)
+        end
+        return tostring(result)
+    end
+    if co_status(main) ~= "dead" then
+        return "attempt to yield from outside a coroutine"
+    end
+    return nil
+end
+"""
+
+
+class BudgetExceeded(Exception):
+    """A sandboxed script ran out of its instruction or time budget."""
+
+
+class WarmRuntime:
+    """A LuaRuntime with the sandbox prelude already loaded."""
+
+    def __init__(self):
+        self.lua = LuaRuntime(unpack_returned_tuples=True, register_eval=False)
+        self.lua.execute(SANDBOX_PRELUDE, time.monotonic)
+        lua_globals = self.lua.globals()
+        self._new_env = lua_globals._synapse_new_env
+        self._run = lua_globals._synapse_run
+        self._compile = lua_globals._synapse_compile
+        self.uses = 0
+        self.retired = False
+
+    def new_env(self, sink):
+        """Return a fresh environment for a single run.
+
+        sink is called with batches of printed lines joined by newlines.
+        """
+        return self._new_env(sink)
+
+    def compile(self, script):
+        """Compile script without running it; return the error or None."""
+        return self._compile(script)
+
+    def run(self, env, script, max_instructions=None, max_seconds=None):
+        """Compile and run script inside env within the given budgets.
+
+        Raises LuaError for compile and runtime errors and BudgetExceeded
+        when a budget stopped the script.
+        """
+        if max_instructions is None:
+            max_instructions = config.SANDBOX_MAX_INSTRUCTIONS
+        if max_seconds is None:
+            max_seconds = config.SANDBOX_MAX_SECONDS
+        result = self._run(env, script, max_instructions, max_seconds)
+        if result is None:
+            return
+        if isinstance(result, tuple):
+            error, exceeded = result
+            if exceeded == 'instructions':
+                raise BudgetExceeded(f"Budget exceeded: script ran more than {max_instructions:,} instructions")
+            raise BudgetExceeded(f"Budget exceeded: script ran longer than {max_seconds:g}s")
+        raise LuaError(result)
+
+    def retire(self):
+        """Drop this runtime instead of returning it to the pool."""
+        self.retired = True
+
+
+class LuaRuntimePool:
+    """Bounded pool of pre-initialized Lua runtimes.
+
+    size      -- maximum number of runtimes alive at once (and concurrent runs)
+    prewarm   -- runtimes created up front so the first requests are fast
+    max_uses  -- runs served by one runtime before it is recycled
+    """
+
+    def __init__(self, size=None, prewarm=None, max_uses=None):
+        self.size = max(1, size if size is not None else config.LUA_POOL_SIZE)
+        self.max_uses = max(1, max_uses if max_uses is not None else config.LUA_POOL_MAX_USES)
+        prewarm = config.LUA_POOL_PREWARM if prewarm is None else prewarm
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'created': 0,
+            'recycled': 0,
+            'checkouts': 0,
+            'reuses': 0,
+        }
+
+        for _ in range(min(prewarm, self.size)):
+            self._idle.put(self._create())
+
+    def _create(self):
+        runtime = WarmRuntime()
+        with self._lock:
+            self._stats['created'] += 1
+        return runtime
+
+    @contextmanager
+    def checkout(self):
+        """Borrow a warm runtime for the duration of one run."""
+        self._slots.acquire()
+        runtime = None
+        try:
+            try:
+                runtime = self._idle.get_nowait()
+                reused = runtime.uses > 0
+            except queue.Empty:
+                runtime = self._create()
+                reused = False
+
+            with self._lock:
+                self._stats['checkouts'] += 1
+                if reused:
+                    self._stats['reuses'] += 1
+
+            yield runtime
+        finally:
+            if runtime is not None:
+                self._release(runtime)
+            self._slots.release()
+
+    def _release(self, runtime):
+        runtime.uses += 1
+        if runtime.retired or runtime.uses >= self.max_uses:
+            # Retire the runtime so anything a script did to the shared
+            # standard library tables cannot accumulate forever.
+            with self._lock:
+                self._stats['recycled'] += 1
+            return
+        self._idle.put(runtime)
+
+    def stats(self):
+        """Return a snapshot of pool counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['max_uses'] = self.max_uses
+        stats['idle'] = self._idle.qsize()
+        return stats
+
+
+class ConsoleBuffer:
+    """Ring buffer of console lines bounded by their total length.
+
+    The oldest lines are dropped once more than max_chars are held, so the
+    memory a chatty script can pin stays fixed.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max(1, max_chars or config.SANDBOX_OUTPUT_LIMIT)
+        self.lines = deque()
+        self.chars = 0
+        self.written = 0
+        self.dropped = 0
+
+    def write(self, chunk):
+        """Add a batch of newline-separated lines."""
+        self.written += len(chunk) + 1
+        for line in chunk.split('\n'):
+            if len(line) >= self.max_chars:
+                line = line[:self.max_chars - 1]
+            self.lines.append(line)
+            self.chars += len(line) + 1
+        while self.chars > self.max_chars:
+            self.chars -= len(self.lines.popleft()) + 1
+            self.dropped += 1
+
+
+def run_script(pool, script, on_output=None):
+    """Run script on a runtime from pool and return a plain result dict.
+
+    on_output, if given, is called with each batch of printed lines as it is
+    produced, until the output limit is reached. The result only holds
+    builtin types so it can cross a process boundary:
+    {'ok': bool, 'error': str or None, 'console': [str, ...], 'dropped': int},
+    plus 'budget_exceeded': True when the script was stopped by a budget,
+    and 'timings': seconds spent in sandbox_setup and script_run.
+    """
+    console = ConsoleBuffer()
+
+    def sink(chunk):
+        streamed = console.written
+        console.write(chunk)
+        if on_output is None or streamed > console.max_chars:
+            return
+        if console.written <= console.max_chars:
+            on_output(chunk)
+        else:
+            on_output(f"[output limit of {console.max_chars:,} characters reached; "
+                      "only the last lines are kept]")
+
+    result = {'ok': True, 'error': None}
+    started = time.perf_counter()
+    running = None
+    try:
+        with pool.checkout() as runtime:
+            # Each run gets a fresh environment with the print capture and
+            # mock Roblox API already set up by the pooled runtime
+            env = runtime.new_env(sink)
+            running = time.perf_counter()
+            try:
+                runtime.run(env, script)
+            except BudgetExceeded:
+                # An aborted script may leave the runtime in any state
+                runtime.retire()
+                raise
+    except BudgetExceeded as e:
+        result = {'ok': False, 'error': str(e), 'budget_exceeded': True}
+    except Exception as e:
+        result = {'ok': False, 'error': str(e)}
+    finished = time.perf_counter()
+    timings = {'sandbox_setup': (running or finished) - started}
+    if running is not None:
+        timings['script_run'] = finished - running
+    # Console output is kept on error too, for partial output
+    result['console'] = list(console.lines)
+    result['dropped'] = console.dropped
+    result['timings'] = timings
+    return result
+
+
+def _observe(result, waited=0.0):
+    """Move a run's timings into the metrics (waited adds to sandbox_setup)"""
+    timings = result.pop('timings', None) or {}
+    metrics.PHASE_SECONDS.observe(timings.get('sandbox_setup', 0.0) + waited, 'sandbox_setup')
+    if 'script_run' in timings:
+        metrics.PHASE_SECONDS.observe(timings['script_run'], 'script_run')
+    return result
+
+
+SHUTTING_DOWN = {'ok': False, 'error': "Sandbox is shutting down", 'console': []}
+
+
+class _RunGate:
+    """Counts runs in flight so a shutdown can refuse new ones and let these finish."""
+
+    def __init__(self):
+        self.closed = False
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def enter(self):
+        with self._cond:
+            if self.closed:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def close(self, wait=0):
+        """Refuse new runs and wait up to wait seconds for active ones; True if none are left."""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            self.closed = True
+            while self.active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return not self.active
+
+
+class InProcessSandbox:
+    """Runs sandboxed scripts on the calling thread (SYNAPSE_SANDBOX_WORKERS=0)."""
+
+    def __init__(self, pool=None):
+        self.pool = pool or LuaRuntimePool()
+        self._gate = _RunGate()
+
+    def run(self, script, timeout=None, on_output=None):
+        if not self._gate.enter():
+            return dict(SHUTTING_DOWN, console=[])
+        try:
+            return _observe(run_script(self.pool, script, on_output))
+        finally:
+            self._gate.leave()
+
+    def run_batch(self, scripts, timeout=None):
+        return [self.run(script, timeout) for script in scripts]
+
+    def shutdown(self, wait=0):
+        """Refuse new runs; runs in progress get up to wait seconds to finish."""
+        return self._gate.close(wait)
+
+    def stats(self):
+        return {'mode': 'in-process', 'running': self._gate.active, 'runtime_pool': self.pool.stats()}
+
+
+def _worker_main(conn):
+    """Entry point of a sandbox worker process: serve jobs until told to stop."""
+    pool = LuaRuntimePool(size=1, prewarm=1)
+    conn.send('ready')
+
+    def send_output(chunk):
+        conn.send(('output', chunk))
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        script, stream = job
+        conn.send(('result', run_script(pool, script, send_output if stream else None)))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn,), name="synapse-sandbox", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.ready:
+            self.ready = self.conn.poll(timeout) and self.conn.recv() == 'ready'
+        return self.ready
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        except Exception:
+            pass
+        self.conn.close()
+
+
+class SandboxProcessPool:
+    """Pool of worker processes that run sandboxed Lua scripts.
+
+    Runs happen outside the web server process, so a heavy script neither
+    blocks a request thread's GIL nor can take the server down with it. The
+    per-run budgets normally stop runaway scripts; a job that still exceeds
+    the timeout (e.g. stuck inside one huge C call) gets its worker killed
+    and replaced.
+    """
+
+    def __init__(self, workers=None, timeout=None):
+        self.workers = max(1, workers or config.SANDBOX_WORKERS or 1)
+        self.timeout = timeout or config.SANDBOX_TIMEOUT
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._gate = _RunGate()
+        self._stats = {
+            'jobs': 0, 'budget_exceeded': 0, 'timeouts': 0, 'crashes': 0, 'respawns': 0, 'busy': 0,
+        }
+
+    def start(self):
+        """Spawn the worker processes (done lazily on first use)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for _ in range(self.workers):
+                self._idle.put(_Worker(self._context))
+
+    def _replace(self, worker):
+        worker.kill()
+        with self._lock:
+            self._stats['respawns'] += 1
+            if self._gate.closed:
+                return
+        self._idle.put(_Worker(self._context))
+
+    def run(self, script, timeout=None, on_output=None):
+        """Run one script on a free worker and return its result dict.
+
+        on_output receives console output batches while the script runs.
+        """
+        if not self._gate.enter():
+            return dict(SHUTTING_DOWN, console=[])
+        try:
+            return self._run(script, timeout, on_output)
+        finally:
+            self._gate.leave()
+
+    def _run(self, script, timeout, on_output):
+        self.start()
+        timeout = timeout or self.timeout
+
+        # Waiting for a free worker has its own bound; the run's timeout only
+        # starts once it has one, so a healthy worker is never killed for
+        # time the job spent queued
+        waiting = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats['busy'] += 1
+            return {'ok': False, 'error': f"Sandbox is busy: no worker was free within {timeout:g}s", 'console': []}
+        try:
+            if not worker.wait_ready(timeout + 5.0):
+                raise EOFError("sandbox worker failed to start")
+            waited = time.perf_counter() - waiting
+            deadline = time.monotonic() + timeout
+            worker.conn.send((script, on_output is not None))
+            while True:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    with self._lock:
+                        self._stats['jobs'] += 1
+                        self._stats['timeouts'] += 1
+                    self._replace(worker)
+                    worker = None
+                    return {
+                        'ok': False,
+                        'error': f"Script timed out after {timeout:g}s",
+                        'console': [],
+                        'timed_out': True,
+                    }
+                kind, payload = worker.conn.recv()
+                if kind == 'result':
+                    result = payload
+                    break
+                on_output(payload)
+            with self._lock:
+                self._stats['jobs'] += 1
+                if result.get('budget_exceeded'):
+                    self._stats['budget_exceeded'] += 1
+            return _observe(result, waited)
+        except (EOFError, OSError) as e:
+            with self._lock:
+                self._stats['crashes'] += 1
+            self._replace(worker)
+            worker = None
+            return {'ok': False, 'error': f"Sandbox worker crashed: {e}", 'console': []}
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+
+    def run_batch(self, scripts, timeout=None):
+        """Run many scripts across all workers; results keep the input order."""
+        scripts = list(scripts)
+        if not scripts:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(scripts))) as dispatch:
+            return list(dispatch.map(lambda script: self.run(script, timeout), scripts))
+
+    def shutdown(self, wait=0):
+        """Stop all workers; idle ones exit cleanly, the rest are killed.
+
+        New runs are refused at once; runs in progress get up to wait
+        seconds to finish first. Returns whether they all did.
+        """
+        drained = self._gate.close(wait)
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+                worker.process.join(1)
+            except (OSError, EOFError):
+                pass
+            worker.kill()
+        return drained
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'mode': 'process',
+            'workers': self.workers,
+            'running': self._gate.active,
+            'idle': self._idle.qsize(),
+            'timeout': self.timeout,
+        })
+        return stats
+
+
+def create_sandbox(pool=None):
+    """Build the sandbox configured by SYNAPSE_SANDBOX_WORKERS.
+
+    pool is the runtime pool an in-process sandbox should share.
+    """
+    if config.SANDBOX_WORKERS > 0:
+        return SandboxProcessPool()
+    return InProcessSandbox(pool)
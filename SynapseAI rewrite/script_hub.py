@@ -1,10 +1,95 @@
 import os
 import json
+import threading
+import time
+import uuid
+from bisect import bisect_right
+
+import config
+import metrics
+from cache import LRUCache
+from search_index import TrigramIndex
+
+class _IndexEntry:
+    """Cached state of one script: stat signatures plus its metadata"""
+    __slots__ = ('lua_sig', 'meta_sig', 'metadata')
 
-class ScriptHub:
     def __init__(self):
-        self.scripts_dir = "scripts"
+        self.lua_sig = None
+        self.meta_sig = None
+        self.metadata = {}
+
+def _signature(stat_result):
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+def _clean_metadata(metadata):
+    """A sidecar's metadata with non-string names and descriptions dropped,
+    so a hand-edited file falls back to the defaults instead of breaking search"""
+    if not isinstance(metadata, dict):
+        return {}
+    return {
+        key: value for key, value in metadata.items()
+        if key not in ('name', 'description') or isinstance(value, str)
+    }
+
+# Saves are staged in temp files and renamed into place; a journal record of
+# the renames (written before any of them) lets a crashed save be completed
+TEMP_SUFFIX = '.tmp'
+JOURNAL_SUFFIX = '.journal'
+
+# Batches at least this large write all their files before syncing any, so
+# the kernel can write them back together instead of one at a time
+GROUP_SYNC_MIN = 8
+
+def _write_file(path, data, sync):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+def _sync_file(path):
+    """fsync a file written and closed earlier (opened writable for Windows)"""
+    fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _sync_dir(path):
+    """Make renames in a directory durable (not possible on Windows)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class ScriptHub:
+    def __init__(self, scripts_dir="scripts"):
+        self.scripts_dir = scripts_dir
+        # Resident index: filename -> _IndexEntry. It holds metadata only; a
+        # scan re-reads just the sidecars whose mtime or size changed, and
+        # script content is read on demand through a bounded LRU cache.
+        self._index = {}
+        self._index_lock = threading.Lock()
+        self._scanned_at = None
+        self._sorted_ids = None
+        self._content_cache = LRUCache(config.HUB_CONTENT_CACHE_BYTES)
+        # Search index over names, descriptions and content. The hub's own
+        # writes update it directly; scripts changed on disk are queued in
+        # _search_pending and re-indexed by the next search.
+        self._search_index = TrigramIndex()
+        self._search_pending = set()
+        self._search_lock = threading.Lock()
+        self._search_warming = False
+        self.version = 0
+        # Saves and deletes of one filename are serialised; see _lock_files
+        self._file_locks = {}
+        self._file_locks_lock = threading.Lock()
         self.ensure_scripts_directory()
+        self.recover()
         self.load_default_scripts()
     
     def ensure_scripts_directory(self):
@@ -12,6 +97,33 @@ class ScriptHub:
         if not os.path.exists(self.scripts_dir):
             os.makedirs(self.scripts_dir)
     
+    def recover(self):
+        """Finish saves a crash interrupted and remove their leftovers"""
+        names = os.listdir(self.scripts_dir)
+        for name in sorted(n for n in names if n.endswith(JOURNAL_SUFFIX)):
+            journal_path = os.path.join(self.scripts_dir, name)
+            try:
+                with open(journal_path, 'r', encoding='utf-8') as f:
+                    renames = json.load(f)
+                # Every temp file was synced before the record was written,
+                # so the save can always be rolled forward
+                for temp, final in renames:
+                    temp_path = os.path.join(self.scripts_dir, temp)
+                    if os.path.exists(temp_path):
+                        os.replace(temp_path, os.path.join(self.scripts_dir, final))
+            except (OSError, ValueError) as e:
+                print(f"Error recovering {name}: {e}")
+            os.remove(journal_path)
+        
+        # Temp files without a journal record belong to saves that never
+        # reached the point of no return
+        for name in names:
+            if name.startswith('.') and name.endswith(TEMP_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.scripts_dir, name))
+                except OSError:
+                    pass
+    
     def load_default_scripts(self):
         """Load default scripts if scripts directory is empty"""
         if not os.listdir(self.scripts_dir):
@@ -225,54 +337,364 @@ game:GetService("StarterGui"):SetCore("SendNotification", {
                 json.dump(meta_data, f, indent=4)
     
     def get_all_scripts(self):
-        """Get all scripts from the scripts directory"""
+        """Get all scripts (with content) from the scripts directory"""
         scripts = {}
+        for item in self.iter_scripts():
+            content = self.get_script_content(item['id'])
+            if content is None:
+                continue
+            scripts[item['name']] = {
+                'filename': item['filename'],
+                'description': item['description'],
+                'content': content
+            }
+        return scripts
+    
+    def iter_scripts(self, cursor=None):
+        """Yield script metadata ordered by id, starting after cursor"""
+        with self._index_lock:
+            self._scan()
+            ids = self._ids()
+            start = bisect_right(ids, cursor) if cursor else 0
         
-        for filename in os.listdir(self.scripts_dir):
-            if filename.endswith('.lua'):
-                script_path = os.path.join(self.scripts_dir, filename)
-                meta_path = script_path.replace('.lua', '.json')
-                
-                # Load script content
+        for script_id in ids[start:]:
+            with self._index_lock:
+                entry = self._index.get(script_id + '.lua')
+                metadata = entry.metadata if entry is not None else None
+            if metadata is None:
+                continue
+            yield {
+                'id': script_id,
+                'name': metadata.get('name', script_id),
+                'filename': script_id + '.lua',
+                'description': metadata.get('description', 'No description available'),
+            }
+    
+    def state_token(self):
+        """Value that changes whenever the hub's contents do (for ETags)"""
+        with self._index_lock:
+            self._scan()
+            return self.version
+    
+    def page_size(self, limit=None):
+        """Clamp a requested listing page size to the configured bounds"""
+        return max(1, min(limit or config.HUB_PAGE_SIZE, config.HUB_PAGE_MAX))
+    
+    def search_scripts(self, query, limit=None):
+        """Search names, descriptions and content; metadata of the best matches"""
+        self._update_search_index()
+        
+        results = []
+        for script_id, score in self._search_index.search(query, self.page_size(limit), self._body_contains):
+            with self._index_lock:
+                entry = self._index.get(script_id + '.lua')
+                metadata = entry.metadata if entry is not None else None
+            if metadata is None:
+                continue
+            results.append({
+                'id': script_id,
+                'name': metadata.get('name', script_id),
+                'filename': script_id + '.lua',
+                'description': metadata.get('description', 'No description available'),
+                'score': score,
+            })
+        return results
+    
+    def _body_contains(self, script_id, terms):
+        """Confirm a body-only search hit: trigrams can match without the term"""
+        content = self.get_script_content(script_id)
+        if content is None:
+            return False
+        with self._index_lock:
+            entry = self._index.get(script_id + '.lua')
+            metadata = entry.metadata if entry is not None else {}
+        text = ' '.join((metadata.get('name', script_id), metadata.get('description', ''), content)).lower()
+        return all(term in text for term in terms)
+    
+    def warm_search_index(self):
+        """Build the search index on a background thread
+        
+        Otherwise the first search reads every script; searches made while
+        the build runs wait for it instead of starting their own.
+        """
+        def build():
+            try:
+                self._update_search_index()
+            except Exception as e:
+                print(f"Error building search index: {e}")
+            finally:
+                self._search_warming = False
+        
+        self._search_warming = True
+        threading.Thread(target=build, name="synapse-search-index", daemon=True).start()
+    
+    def _update_search_index(self):
+        """Re-index the scripts a scan found changed on disk"""
+        with self._search_lock:
+            with self._index_lock:
+                self._scan()
+                pending, self._search_pending = self._search_pending, set()
+            
+            for filename in pending:
+                script_id = filename[:-4]
+                with self._index_lock:
+                    entry = self._index.get(filename)
+                    metadata = entry.metadata if entry is not None else None
+                content = self.get_script_content(script_id) if metadata is not None else None
+                if content is None:
+                    self._search_index.remove(script_id)
+                else:
+                    self._search_index.update(
+                        script_id, metadata.get('name', script_id), metadata.get('description', ''), content
+                    )
+    
+    def stats(self):
+        with self._index_lock:
+            scripts = len(self._index)
+            pending = len(self._search_pending)
+        return {
+            'backend': 'files',
+            'scripts': scripts,
+            'version': self.version,
+            'content_cache': self._content_cache.stats(),
+            'search_index': dict(self._search_index.stats(), pending=pending, warming=self._search_warming),
+        }
+    
+    def get_script(self, script_id):
+        """Return one script's metadata and content, or None"""
+        with self._index_lock:
+            self._scan()
+            entry = self._index.get(script_id + '.lua')
+            metadata = entry.metadata if entry is not None else None
+        if metadata is None:
+            return None
+        
+        content = self.get_script_content(script_id)
+        if content is None:
+            return None
+        return {
+            'id': script_id,
+            'name': metadata.get('name', script_id),
+            'filename': script_id + '.lua',
+            'description': metadata.get('description', 'No description available'),
+            'content': content,
+        }
+    
+    def get_script_content(self, script_id):
+        """Read a script's content, served from the LRU cache when unchanged"""
+        filename = script_id + '.lua'
+        with self._index_lock:
+            entry = self._index.get(filename)
+            lua_sig = entry.lua_sig if entry is not None else None
+        if lua_sig is None:
+            return None
+        
+        cached = self._content_cache.get(filename)
+        if cached is not None and cached[0] == lua_sig:
+            return cached[1]
+        
+        script_path = os.path.join(self.scripts_dir, filename)
+        try:
+            with metrics.phase('hub_read'):
                 with open(script_path, 'r', encoding='utf-8') as f:
                     content = f.read()
-                
-                # Load metadata if exists
-                metadata = {}
-                if os.path.exists(meta_path):
-                    try:
-                        with open(meta_path, 'r', encoding='utf-8') as f:
-                            metadata = json.load(f)
-                    except:
-                        pass
-                
-                script_name = metadata.get('name', filename.replace('.lua', ''))
-                scripts[script_name] = {
-                    'filename': filename,
-                    'description': metadata.get('description', 'No description available'),
-                    'content': content
-                }
+                lua_sig = _signature(os.stat(script_path))
+        except OSError:
+            return None
+        self._content_cache.put(filename, (lua_sig, content))
+        return content
+    
+    def _ids(self):
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(filename[:-4] for filename in self._index)
+        return self._sorted_ids
+    
+    def _changed(self):
+        self._sorted_ids = None
+        self.version += 1
+    
+    def _scan(self):
+        """Bring the index up to date using one directory scan's stat data"""
+        # The hub's own writes update the index directly, so a fresh scan is
+        # only needed to notice edits made outside the app
+        now = time.monotonic()
+        if self._scanned_at is not None and now - self._scanned_at < config.HUB_SCAN_INTERVAL:
+            return
+        self._scanned_at = now
+        with metrics.phase('hub_scan'):
+            self._scan_dir()
+    
+    def _scan_dir(self):
+        """Apply the changes one scandir() of the scripts folder shows"""
+        lua_stats = {}
+        meta_stats = {}
+        with os.scandir(self.scripts_dir) as entries:
+            for dir_entry in entries:
+                if dir_entry.name.endswith('.lua'):
+                    lua_stats[dir_entry.name] = dir_entry.stat()
+                elif dir_entry.name.endswith('.json'):
+                    meta_stats[dir_entry.name] = dir_entry.stat()
         
-        return scripts
+        changed = False
+        for filename in self._index.keys() - lua_stats.keys():
+            del self._index[filename]
+            self._search_pending.add(filename)
+            changed = True
+        
+        for filename, lua_stat in lua_stats.items():
+            meta_stat = meta_stats.get(filename[:-4] + '.json')
+            entry = self._index.get(filename)
+            if entry is None:
+                entry = self._index[filename] = _IndexEntry()
+            if self._refresh_entry(filename, entry, lua_stat, meta_stat):
+                self._search_pending.add(filename)
+                changed = True
+        
+        if changed:
+            self._changed()
+    
+    def _refresh_entry(self, filename, entry, lua_stat, meta_stat):
+        """Re-read the metadata if it changed; True if anything did"""
+        lua_sig = _signature(lua_stat)
+        meta_sig = _signature(meta_stat) if meta_stat is not None else None
+        changed = False
+        
+        if entry.lua_sig != lua_sig:
+            # Content is read lazily; the new signature invalidates the cache
+            entry.lua_sig = lua_sig
+            changed = True
+        
+        if entry.meta_sig != meta_sig:
+            # Load metadata if exists
+            metadata = {}
+            if meta_sig is not None:
+                try:
+                    meta_path = os.path.join(self.scripts_dir, filename[:-4] + '.json')
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                except:
+                    pass
+            entry.metadata = _clean_metadata(metadata)
+            entry.meta_sig = meta_sig
+            changed = True
+        
+        return changed
+    
+    def _index_file(self, filename, content, metadata, search_now=True):
+        """Record a script just written by the hub, without reading it back
+        
+        search_now=False queues the script for the search index instead.
+        """
+        script_path = os.path.join(self.scripts_dir, filename)
+        try:
+            lua_sig = _signature(os.stat(script_path))
+            meta_sig = _signature(os.stat(script_path.replace('.lua', '.json')))
+        except OSError:
+            # Let the next scan pick it up from disk
+            self._scanned_at = None
+            return
+        with self._index_lock:
+            entry = self._index.get(filename)
+            if entry is None:
+                entry = self._index[filename] = _IndexEntry()
+            entry.lua_sig = lua_sig
+            entry.meta_sig, entry.metadata = meta_sig, metadata
+            if search_now:
+                self._search_pending.discard(filename)
+            else:
+                self._search_pending.add(filename)
+            self._changed()
+        self._content_cache.put(filename, (lua_sig, content))
+        if search_now:
+            self._search_index.update(filename[:-4], metadata['name'], metadata['description'], content)
+    
+    def _lock_files(self, filenames):
+        """Per-filename locks for filenames, in a deadlock-free order"""
+        with self._file_locks_lock:
+            return [
+                self._file_locks.setdefault(filename, threading.Lock())
+                for filename in sorted(set(filenames))
+            ]
     
     def add_script(self, name, content, description=""):
         """Add a new script to the hub"""
-        filename = name.lower().replace(' ', '_') + '.lua'
-        filepath = os.path.join(self.scripts_dir, filename)
-        
-        # Save script
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        return self.add_scripts([(name, content, description)])
+    
+    def add_scripts(self, scripts):
+        """Save (name, content, description) tuples as one group commit"""
+        return self.put_scripts(
+            (name.lower().replace(' ', '_'), name, description, content)
+            for name, content, description in scripts
+        )
+    
+    def put_scripts(self, records):
+        """Write (script_id, name, description, content) records as one group commit
         
-        # Save metadata
-        meta_filepath = filepath.replace('.lua', '.json')
-        metadata = {
-            'name': name,
-            'description': description
-        }
-        with open(meta_filepath, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=4)
+        Each script's .lua and .json are written to temp files, synced, and
+        renamed into place after one journal record covering the whole batch,
+        so every pair on disk is always from the same save. Large batches
+        write every file before syncing them, then sync the directory once.
+        """
+        staged = {}  # filename -> (content, metadata); the last save of a name wins
+        for script_id, name, description, content in records:
+            staged[script_id + '.lua'] = (content, {'name': name, 'description': description})
+        if not staged:
+            return True
         
+        sync = config.HUB_FSYNC
+        group_sync = sync and len(staged) >= GROUP_SYNC_MIN
+        locks = self._lock_files(staged)
+        for lock in locks:
+            lock.acquire()
+        try:
+            token = uuid.uuid4().hex
+            renames = []
+            try:
+                for filename, (content, metadata) in staged.items():
+                    meta_filename = filename[:-4] + '.json'
+                    for final, data in (
+                        (filename, content),
+                        (meta_filename, json.dumps(metadata, indent=4))
+                    ):
+                        temp = f".{final}.{token}{TEMP_SUFFIX}"
+                        renames.append((temp, final))
+                        _write_file(os.path.join(self.scripts_dir, temp), data, sync and not group_sync)
+                if group_sync:
+                    for temp, _ in renames:
+                        _sync_file(os.path.join(self.scripts_dir, temp))
+                if sync:
+                    # The temp files' names must be durable before the
+                    # journal that refers to them
+                    _sync_dir(self.scripts_dir)
+                
+                journal = f".{token}{JOURNAL_SUFFIX}"
+                journal_path = os.path.join(self.scripts_dir, journal)
+                _write_file(journal_path + TEMP_SUFFIX, json.dumps(renames), sync)
+                os.replace(journal_path + TEMP_SUFFIX, journal_path)
+                if sync:
+                    _sync_dir(self.scripts_dir)
+            except BaseException:
+                # Nothing has been renamed yet: the old files are untouched
+                for temp, _ in renames:
+                    try:
+                        os.remove(os.path.join(self.scripts_dir, temp))
+                    except OSError:
+                        pass
+                raise
+            
+            for temp, final in renames:
+                os.replace(os.path.join(self.scripts_dir, temp), os.path.join(self.scripts_dir, final))
+            if sync:
+                _sync_dir(self.scripts_dir)
+            os.remove(journal_path)
+            
+            # Large batches leave the search index to catch up on the next search
+            search_now = len(staged) < GROUP_SYNC_MIN
+            for filename, (content, metadata) in staged.items():
+                self._index_file(filename, content, metadata, search_now)
+        finally:
+            for lock in locks:
+                lock.release()
         return True
     
     def delete_script(self, filename):
@@ -280,12 +702,34 @@ game:GetService("StarterGui"):SetCore("SendNotification", {
         script_path = os.path.join(self.scripts_dir, filename)
         meta_path = script_path.replace('.lua', '.json')
         
+        [lock] = self._lock_files([filename])
         try:
-            if os.path.exists(script_path):
-                os.remove(script_path)
-            if os.path.exists(meta_path):
-                os.remove(meta_path)
+            with lock:
+                # The script goes first: metadata without a script is ignored
+                if os.path.exists(script_path):
+                    os.remove(script_path)
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+                with self._index_lock:
+                    if self._index.pop(filename, None) is not None:
+                        self._changed()
+                    self._search_pending.discard(filename)
+                self._content_cache.pop(filename)
+                self._search_index.remove(filename[:-4])
             return True
         except Exception as e:
             print(f"Error deleting script: {e}")
             return False
+
+def create_script_hub():
+    """Build the hub storage configured by SYNAPSE_HUB_BACKEND"""
+    if config.HUB_BACKEND == 'sqlite':
+        from sqlite_hub import SQLiteScriptHub
+        return SQLiteScriptHub()
+    if config.HUB_BACKEND == 'blobs':
+        from blob_hub import BlobScriptHub
+        hub = BlobScriptHub()
+    else:
+        hub = ScriptHub()
+    hub.warm_search_index()
+    return hub
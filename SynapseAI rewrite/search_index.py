@@ -0,0 +1,259 @@
+"""
+In-memory trigram index for Script Hub search.
+
+Every script's name, description and body are lowercased and split into
+three-character substrings; each trigram maps to the scripts that contain
+it. A query term is looked up by intersecting the postings of its own
+trigrams, rarest first, so the cost depends on how rare the term is rather
+than on the size of the hub.
+
+A second, much smaller set of postings covers names and descriptions only.
+It finds the scripts that earn more than the body score, so a common term
+does not mean scoring every script that mentions it. It also holds the one-
+and two-character substrings of those fields, which answer query terms
+shorter than a trigram (such terms only match names and descriptions).
+
+Postings are sorted arrays of 4-byte script numbers. Numbers only grow: a
+re-indexed script gets a new number appended to its trigrams' postings and
+its old number becomes a tombstone, skipped by lookups and dropped when the
+postings are compacted.
+"""
+
+import heapq
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+# Score of a term found in each field; a script's score is the sum over terms
+NAME_WEIGHT = 10
+DESCRIPTION_WEIGHT = 4
+BODY_WEIGHT = 1
+
+# Compact once tombstones make up this share of all postings
+COMPACT_RATIO = 0.5
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def short_grams(text):
+    """Substrings of one and two characters."""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _contains(posting, number):
+    i = bisect_left(posting, number)
+    return i < len(posting) and posting[i] == number
+
+
+class _Doc:
+    __slots__ = ('key', 'name', 'description', 'trigrams')
+
+
+class TrigramIndex:
+    """Trigram -> script postings, updated one script at a time.
+
+    Keys are caller-chosen script ids. Only lowercased names and descriptions
+    are kept per script; bodies are indexed but not stored, so a hit on the
+    body alone is a candidate the caller confirms (see search()).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}      # trigram -> array of script numbers (all text)
+        self._field_postings = {}  # trigram -> array of script numbers (name, description)
+        self._docs = {}          # script number -> _Doc
+        self._numbers = {}       # key -> script number
+        self._next_number = 0
+        self._live_postings = 0
+        self._dead_postings = 0
+        self._stats = {'updates': 0, 'removals': 0, 'queries': 0, 'compactions': 0}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def update(self, key, name, description, content):
+        """Index (or re-index) one script."""
+        doc = _Doc()
+        doc.key = key
+        doc.name = name.lower()
+        doc.description = description.lower()
+        field_grams = trigrams(doc.name) | trigrams(doc.description)
+        grams = field_grams | trigrams(content.lower())
+        field_grams |= short_grams(doc.name) | short_grams(doc.description)
+        doc.trigrams = len(grams) + len(field_grams)
+
+        with self._lock:
+            self._drop(key)
+            number = self._numbers[key] = self._next_number
+            self._next_number += 1
+            self._docs[number] = doc
+            for postings, added in ((self._postings, grams), (self._field_postings, field_grams)):
+                for gram in added:
+                    posting = postings.get(gram)
+                    if posting is None:
+                        posting = postings[gram] = array('I')
+                    posting.append(number)
+            self._live_postings += doc.trigrams
+            self._stats['updates'] += 1
+            self._maybe_compact()
+
+    def remove(self, key):
+        with self._lock:
+            if self._drop(key):
+                self._stats['removals'] += 1
+                self._maybe_compact()
+
+    def _drop(self, key):
+        number = self._numbers.pop(key, None)
+        if number is None:
+            return False
+        doc = self._docs.pop(number)
+        self._live_postings -= doc.trigrams
+        self._dead_postings += doc.trigrams
+        return True
+
+    def _maybe_compact(self):
+        total = self._live_postings + self._dead_postings
+        if self._dead_postings <= COMPACT_RATIO * total:
+            return
+        docs = self._docs
+        for postings in (self._postings, self._field_postings):
+            for gram in list(postings):
+                live = array('I', [number for number in postings[gram] if number in docs])
+                if live:
+                    postings[gram] = live
+                else:
+                    del postings[gram]
+        self._dead_postings = 0
+        self._stats['compactions'] += 1
+
+    def _lookup(self, index, term):
+        """Script numbers with every trigram of term in index (a superset of real matches)."""
+        postings = []
+        for gram in trigrams(term):
+            posting = index.get(gram)
+            if posting is None:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+
+        matched = set(postings[0])
+        for posting in postings[1:]:
+            if len(matched) * 16 < len(posting):
+                # Few candidates left: probe the long posting instead of reading it
+                matched = {number for number in matched if _contains(posting, number)}
+            else:
+                matched.intersection_update(posting)
+            if not matched:
+                break
+        return matched
+
+    def search(self, query, limit, confirm=None):
+        """Return up to limit (key, score) pairs matching every query term, best first.
+
+        A script whose terms were not all found in its name or description
+        matched on body trigrams only, which can occur apart; confirm(key,
+        terms) is asked to check such hits and false ones are skipped.
+        Terms shorter than a trigram are matched against names and
+        descriptions only.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return []
+
+        long_terms = [term for term in terms if len(term) >= 3]
+        short_terms = [term for term in terms if len(term) < 3]
+        with self._lock:
+            self._stats['queries'] += 1
+            candidates = None
+            for term in long_terms:
+                matched = self._lookup(self._postings, term)
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return []
+            for term in short_terms:
+                posting = self._field_postings.get(term, ())
+                if candidates is None:
+                    candidates = set(posting)
+                else:
+                    candidates = {number for number in candidates if _contains(posting, number)}
+                if not candidates:
+                    return []
+
+            docs = self._docs
+            if short_terms:
+                # Short terms were found in the name or description: every
+                # candidate is scored there
+                scored, body_only = candidates, ()
+            else:
+                scored = set()
+                for term in terms:
+                    scored |= self._lookup(self._field_postings, term)
+                scored &= candidates
+                # The rest can only have matched in the body, each for the same
+                # score, which is below that of any name or description hit
+                body_only = candidates - scored
+
+            ranked = []
+            for number in scored:
+                doc = docs.get(number)
+                if doc is None:
+                    continue  # Tombstone
+                score = 0
+                confirmed = True
+                for term in terms:
+                    if term in doc.name:
+                        score += NAME_WEIGHT
+                    elif term in doc.description:
+                        score += DESCRIPTION_WEIGHT
+                    elif len(term) >= 3:
+                        score += BODY_WEIGHT
+                        confirmed = False
+                    else:
+                        break
+                else:
+                    ranked.append((-score, doc.name, doc.key, confirmed))
+            body_only = sorted(body_only)
+
+        # Only the returned results need ordering
+        heapq.heapify(ranked)
+        results = []
+        while ranked and len(results) < limit:
+            score, _, key, confirmed = heapq.heappop(ranked)
+            if confirmed or confirm is None or confirm(key, long_terms):
+                results.append((key, -score))
+
+        body_score = BODY_WEIGHT * len(terms)
+        for number in body_only:
+            if len(results) >= limit:
+                break
+            with self._lock:
+                doc = docs.get(number)
+            if doc is not None and (confirm is None or confirm(doc.key, long_terms)):
+                results.append((doc.key, body_score))
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            memory = sum(
+                sys.getsizeof(postings) + sum(
+                    sys.getsizeof(gram) + sys.getsizeof(posting) for gram, posting in postings.items()
+                )
+                for postings in (self._postings, self._field_postings)
+            )
+            memory += sys.getsizeof(self._docs) + sys.getsizeof(self._numbers) + sum(
+                sys.getsizeof(doc) + sys.getsizeof(doc.name) + sys.getsizeof(doc.description)
+                for doc in self._docs.values()
+            )
+            stats.update({
+                'scripts': len(self._docs),
+                'trigrams': len(self._postings),
+                'postings': self._live_postings,
+                'tombstones': self._dead_postings,
+                'memory_bytes': memory,
+            })
+        return stats
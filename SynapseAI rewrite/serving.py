@@ -0,0 +1,130 @@
+"""
+Production serving (python main.py --serve) on the waitress WSGI server.
+
+Werkzeug's development server behind app.run() is not meant for sustained
+load. waitress serves the same app from a pool of worker threads, with a
+configurable listen backlog, connection limit and keep-alive timeout. It
+stays single-process on purpose: jobs, validation sessions and the status
+monitor live in memory, and scripts already run in sandbox worker
+processes.
+
+Shutdown is graceful. The first SIGINT or SIGTERM starts a drain on a
+background thread while the server keeps answering: the drain callback
+refuses new sandbox runs and jobs and waits for those in progress, then the
+requests still being handled get the rest of the timeout before the server
+stops. A second signal skips the wait (waitress still gives its threads a
+few seconds to wind down).
+"""
+
+import _thread
+import signal
+import threading
+import time
+
+import config
+
+try:
+    import waitress
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+
+class _InFlight:
+    """WSGI wrapper counting requests whose handler has not returned yet."""
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        with self._cond:
+            self.active += 1
+        try:
+            return self.app(environ, start_response)
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return not self.active
+
+
+class Server:
+    """A waitress server for app plus its graceful shutdown.
+
+    drain            -- called with the seconds left when shutdown starts;
+                        should stop new work and wait for work in progress
+    shutdown_timeout -- seconds the whole drain may take
+    """
+
+    def __init__(self, app, host='127.0.0.1', port=5001, threads=None, backlog=None,
+                 connection_limit=None, keepalive=None, drain=None, shutdown_timeout=None):
+        if not WAITRESS_AVAILABLE:
+            raise RuntimeError("waitress is not installed (pip install waitress)")
+        self.threads = max(1, threads or config.SERVE_THREADS)
+        self.drain = drain
+        self.shutdown_timeout = config.SHUTDOWN_TIMEOUT if shutdown_timeout is None else shutdown_timeout
+        self._in_flight = _InFlight(app)
+        self._draining = threading.Event()
+        self._drained = threading.Event()
+        self._signals = False
+        self._server = waitress.create_server(
+            self._in_flight,
+            host=host,
+            port=port,
+            threads=self.threads,
+            backlog=backlog or config.SERVE_BACKLOG,
+            connection_limit=connection_limit or config.SERVE_CONNECTION_LIMIT,
+            channel_timeout=keepalive or config.SERVE_KEEPALIVE,
+            ident='SynapseAI',
+        )
+
+    def run(self):
+        """Serve until stopped; signals are handled when called on the main thread."""
+        if threading.current_thread() is threading.main_thread():
+            self._signals = True
+            signal.signal(signal.SIGINT, self._on_signal)
+            if hasattr(signal, 'SIGTERM'):
+                signal.signal(signal.SIGTERM, self._on_signal)
+        self._server.run()
+
+    def _on_signal(self, signum, frame):
+        if self._draining.is_set():
+            # A second signal, or the drain finishing: leave the serve loop
+            raise KeyboardInterrupt
+        print(f"\nShutting down; waiting up to {self.shutdown_timeout:g}s for work in progress "
+              "(signal again to skip the wait)")
+        self.shutdown()
+
+    def shutdown(self, wait=False):
+        """Start a graceful shutdown (run() on the main thread returns once it is done)."""
+        if not self._draining.is_set():
+            self._draining.set()
+            threading.Thread(target=self._drain, name="synapse-shutdown", daemon=True).start()
+        if wait:
+            self._drained.wait()
+
+    def _drain(self):
+        deadline = time.monotonic() + self.shutdown_timeout
+        try:
+            if self.drain is not None:
+                self.drain(self.shutdown_timeout)
+            if not self._in_flight.wait(max(0.0, deadline - time.monotonic())):
+                print(f"Stopping with {self._in_flight.active} request(s) still in progress")
+        finally:
+            self._drained.set()
+            if self._signals:
+                # Delivered to the main thread's handler, which then raises
+                # KeyboardInterrupt and waitress winds down its threads
+                _thread.interrupt_main()
+
@@ -29,6 +29,8 @@ setup(
         "flask>=2.3.0",
         "flask-cors>=4.0.0",
         "psutil>=5.9.0",
+        # Production server for `synapse --serve`
+        "waitress>=2.1",
         # Optional but used for native macOS window launcher
         "pywebview>=4.4",
     ],
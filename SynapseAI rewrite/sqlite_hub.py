@@ -0,0 +1,264 @@
+"""
+SQLite storage backend for the Script Hub (SYNAPSE_HUB_BACKEND=sqlite).
+
+Scripts and their metadata live in one database in WAL mode, so listings,
+lookups and writes are indexed queries instead of directory scans, and
+full-text search runs through an FTS5 index kept in sync by triggers. The
+interface matches ScriptHub.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scripts (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    content TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS scripts_fts USING fts5(
+    name, description, content,
+    content='scripts', content_rowid='rowid'
+);
+
+-- Bumped on every change; ETags and caches key off it
+CREATE TABLE IF NOT EXISTS hub_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO hub_state (key, value) VALUES ('version', 0);
+
+CREATE TRIGGER IF NOT EXISTS scripts_ai AFTER INSERT ON scripts BEGIN
+    INSERT INTO scripts_fts (rowid, name, description, content)
+        VALUES (new.rowid, new.name, new.description, new.content);
+    UPDATE hub_state SET value = value + 1 WHERE key = 'version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS scripts_ad AFTER DELETE ON scripts BEGIN
+    INSERT INTO scripts_fts (scripts_fts, rowid, name, description, content)
+        VALUES ('delete', old.rowid, old.name, old.description, old.content);
+    UPDATE hub_state SET value = value + 1 WHERE key = 'version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS scripts_au AFTER UPDATE ON scripts BEGIN
+    INSERT INTO scripts_fts (scripts_fts, rowid, name, description, content)
+        VALUES ('delete', old.rowid, old.name, old.description, old.content);
+    INSERT INTO scripts_fts (rowid, name, description, content)
+        VALUES (new.rowid, new.name, new.description, new.content);
+    UPDATE hub_state SET value = value + 1 WHERE key = 'version';
+END;
+"""
+
+UPSERT = """
+INSERT INTO scripts (id, name, description, content, updated)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    name = excluded.name,
+    description = excluded.description,
+    content = excluded.content,
+    updated = excluded.updated
+"""
+
+
+def _fts_query(query):
+    """Turn free text into an FTS5 query: every word, as a prefix."""
+    terms = ['"' + word.replace('"', '""') + '"*' for word in query.split()]
+    return ' '.join(terms)
+
+
+class SQLiteScriptHub:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or config.HUB_DB_PATH
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        db = self._db()
+        db.executescript(SCHEMA)
+        if db.execute("SELECT COUNT(*) FROM scripts").fetchone()[0] == 0:
+            # First start: bring over the folder hub (which creates the
+            # default scripts if that is empty too)
+            from script_hub import ScriptHub
+            self.import_scripts(ScriptHub())
+
+    def _db(self):
+        """Connection for the calling thread"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @property
+    def version(self):
+        return self.state_token()
+
+    def state_token(self):
+        """Value that changes whenever the hub's contents do (for ETags)"""
+        return self._db().execute("SELECT value FROM hub_state WHERE key = 'version'").fetchone()[0]
+
+    def page_size(self, limit=None):
+        """Clamp a requested listing page size to the configured bounds"""
+        return max(1, min(limit or config.HUB_PAGE_SIZE, config.HUB_PAGE_MAX))
+
+    def get_all_scripts(self):
+        """Get all scripts (with content)"""
+        scripts = {}
+        rows = self._db().execute("SELECT id, name, description, content FROM scripts ORDER BY id")
+        for script_id, name, description, content in rows:
+            scripts[name] = {
+                'filename': script_id + '.lua',
+                'description': description,
+                'content': content
+            }
+        return scripts
+
+    def iter_scripts(self, cursor=None):
+        """Yield script metadata ordered by id, starting after cursor"""
+        rows = self._db().execute(
+            "SELECT id, name, description FROM scripts WHERE id > ? ORDER BY id",
+            (cursor or '',)
+        )
+        for script_id, name, description in rows:
+            yield {
+                'id': script_id,
+                'name': name,
+                'filename': script_id + '.lua',
+                'description': description,
+            }
+
+    def get_script(self, script_id):
+        """Return one script's metadata and content, or None"""
+        row = self._db().execute(
+            "SELECT name, description, content FROM scripts WHERE id = ?", (script_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': script_id,
+            'name': row[0],
+            'filename': script_id + '.lua',
+            'description': row[1],
+            'content': row[2],
+        }
+
+    def get_script_content(self, script_id):
+        row = self._db().execute("SELECT content FROM scripts WHERE id = ?", (script_id,)).fetchone()
+        return row[0] if row else None
+
+    def search_scripts(self, query, limit=None):
+        """Full-text search over names, descriptions and content, best first"""
+        fts_query = _fts_query(query)
+        if not fts_query:
+            return []
+        rows = self._db().execute(
+            """
+            SELECT s.id, s.name, s.description, -bm25(scripts_fts, 10.0, 4.0, 1.0) AS score
+            FROM scripts_fts JOIN scripts AS s ON s.rowid = scripts_fts.rowid
+            WHERE scripts_fts MATCH ?
+            ORDER BY score DESC
+            LIMIT ?
+            """,
+            (fts_query, self.page_size(limit))
+        )
+        return [
+            {
+                'id': script_id,
+                'name': name,
+                'filename': script_id + '.lua',
+                'description': description,
+                'score': round(score, 3),
+            }
+            for script_id, name, description, score in rows
+        ]
+
+    def add_script(self, name, content, description=""):
+        """Add a new script to the hub"""
+        script_id = name.lower().replace(' ', '_')
+        with self._write_lock:
+            self._db().execute(UPSERT, (script_id, name, description, content, time.time()))
+        return True
+
+    def add_scripts(self, scripts):
+        """Save (name, content, description) tuples in one transaction"""
+        return self.put_scripts(
+            (name.lower().replace(' ', '_'), name, description, content)
+            for name, content, description in scripts
+        )
+
+    def put_scripts(self, records):
+        """Write (script_id, name, description, content) records in one transaction"""
+        now = time.time()
+        self._write_rows([
+            (script_id, name, description, content, now)
+            for script_id, name, description, content in records
+        ])
+        return True
+
+    def delete_script(self, filename):
+        """Delete a script from the hub"""
+        script_id = filename[:-4] if filename.endswith('.lua') else filename
+        try:
+            with self._write_lock:
+                self._db().execute("DELETE FROM scripts WHERE id = ?", (script_id,))
+            return True
+        except sqlite3.Error as e:
+            print(f"Error deleting script: {e}")
+            return False
+
+    def stats(self):
+        db = self._db()
+        page_count = db.execute("PRAGMA page_count").fetchone()[0]
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'scripts': db.execute("SELECT COUNT(*) FROM scripts").fetchone()[0],
+            'version': self.state_token(),
+            'db_bytes': page_count * page_size,
+        }
+
+    def import_scripts(self, source):
+        """One-shot import from a folder ScriptHub; returns scripts imported"""
+        records = []
+        for item in source.iter_scripts():
+            content = source.get_script_content(item['id'])
+            if content is not None:
+                records.append((item['id'], item['name'], item['description'], content))
+
+        self.put_scripts(records)
+        return len(records)
+
+    def _write_rows(self, rows):
+        db = self._db()
+        with self._write_lock:
+            # One transaction (and one WAL sync) for the whole batch
+            db.execute("BEGIN")
+            try:
+                db.executemany(UPSERT, rows)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+
+if __name__ == '__main__':
+    import argparse
+    from script_hub import ScriptHub
+
+    parser = argparse.ArgumentParser(description="Import a scripts/ folder into the SQLite hub")
+    parser.add_argument('--db', default=config.HUB_DB_PATH)
+    args = parser.parse_args()
+
+    if not os.path.isdir("scripts"):
+        parser.error("no scripts/ folder in the current directory")
+    count = SQLiteScriptHub(args.db).import_scripts(ScriptHub())
+    print(f"Imported {count} scripts into {args.db}")
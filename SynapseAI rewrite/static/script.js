@@ -1,6 +1,17 @@
 // State
 let isInjected = false;
 
+// As-you-type validation: the server keeps this session's document and only
+// re-lexes the line range we report as changed
+const validationSession = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : Math.random().toString(36).slice(2) + Date.now().toString(36);
+let validationVersion = 0;
+let validatedLines = null;
+let validationTimer = null;
+let validationInFlight = false;
+let validationQueued = false;
+
 // DOM Elements
 const scriptEditor = document.getElementById('script-editor');
 const statusDot = document.getElementById('status-dot');
@@ -14,11 +25,18 @@ const loadBtn = document.getElementById('load-btn');
 const hubBtn = document.getElementById('hub-btn');
 const lineCount = document.getElementById('line-count');
 const charCount = document.getElementById('char-count');
+const syntaxStatus = document.getElementById('syntax-status');
+const consoleOutput = document.getElementById('console-output');
+const consoleClearBtn = document.getElementById('console-clear-btn');
+
+// Characters kept in the console panel; older output is trimmed
+const CONSOLE_LIMIT = 200000;
 
 // Modals
 const hubModal = document.getElementById('hub-modal');
 const saveModal = document.getElementById('save-modal');
 const scriptsContainer = document.getElementById('scripts-container');
+const hubSearch = document.getElementById('hub-search');
 const notificationContainer = document.getElementById('notification-container');
 
 // Close buttons
@@ -30,9 +48,12 @@ const saveConfirmBtn = document.getElementById('save-confirm-btn');
 // Initialize
 updateEditorStats();
 checkStatus();
+watchStatus();
+scheduleValidation();
 
 // Event Listeners
 scriptEditor.addEventListener('input', updateEditorStats);
+scriptEditor.addEventListener('input', scheduleValidation);
 injectBtn.addEventListener('click', inject);
 executeBtn.addEventListener('click', executeScript);
 testBtn.addEventListener('click', testScript);
@@ -40,6 +61,8 @@ clearBtn.addEventListener('click', clearEditor);
 saveBtn.addEventListener('click', showSaveModal);
 loadBtn.addEventListener('click', loadFromFile);
 hubBtn.addEventListener('click', showScriptHub);
+hubSearch.addEventListener('input', scheduleHubSearch);
+consoleClearBtn.addEventListener('click', clearConsole);
 closeHubBtn.addEventListener('click', () => hideModal(hubModal));
 closeSaveBtn.addEventListener('click', () => hideModal(saveModal));
 saveCancelBtn.addEventListener('click', () => hideModal(saveModal));
@@ -61,6 +84,97 @@ function updateEditorStats() {
     charCount.textContent = `Characters: ${chars}`;
 }
 
+function scheduleValidation() {
+    clearTimeout(validationTimer);
+    validationTimer = setTimeout(validateEditor, 250);
+}
+
+function diffLines(oldLines, newLines) {
+    // Single changed range between the common prefix and common suffix
+    let start = 0;
+    const maxStart = Math.min(oldLines.length, newLines.length);
+    while (start < maxStart && oldLines[start] === newLines[start]) {
+        start++;
+    }
+    let oldEnd = oldLines.length;
+    let newEnd = newLines.length;
+    while (oldEnd > start && newEnd > start && oldLines[oldEnd - 1] === newLines[newEnd - 1]) {
+        oldEnd--;
+        newEnd--;
+    }
+    return { start, end: oldEnd, lines: newLines.slice(start, newEnd) };
+}
+
+async function validateEditor() {
+    if (validationInFlight) {
+        validationQueued = true;
+        return;
+    }
+    validationInFlight = true;
+    
+    const lines = scriptEditor.value.split('\n');
+    const payload = {
+        session: validationSession,
+        version: validationVersion + 1
+    };
+    if (validatedLines === null) {
+        payload.text = scriptEditor.value;
+    } else {
+        const edit = diffLines(validatedLines, lines);
+        if (edit.start === edit.end && edit.lines.length === 0) {
+            validationInFlight = false;
+            return;
+        }
+        payload.base_version = validationVersion;
+        payload.edits = [edit];
+    }
+    
+    try {
+        const response = await fetch('/api/validate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(payload)
+        });
+        const data = await response.json();
+        
+        if (data.resync) {
+            validatedLines = null;
+            validationQueued = true;
+        } else if (data.success) {
+            validationVersion = data.version;
+            validatedLines = lines;
+            showSyntaxStatus(data);
+        }
+    } catch (error) {
+        console.error('Validation failed:', error);
+    } finally {
+        validationInFlight = false;
+        if (validationQueued) {
+            validationQueued = false;
+            validateEditor();
+        }
+    }
+}
+
+function showSyntaxStatus(data) {
+    syntaxStatus.classList.remove('ok', 'error');
+    syntaxStatus.title = '';
+    if (data.valid) {
+        syntaxStatus.textContent = '✓ Syntax OK';
+        syntaxStatus.classList.add('ok');
+    } else if (data.errors.length) {
+        const first = data.errors[0];
+        const more = data.errors.length > 1 ? ` (+${data.errors.length - 1} more)` : '';
+        syntaxStatus.textContent = (first.line ? `Line ${first.line}: ` : '') + first.message + more;
+        syntaxStatus.title = data.message;
+        syntaxStatus.classList.add('error');
+    } else {
+        syntaxStatus.textContent = '';
+    }
+}
+
 async function checkStatus() {
     try {
         const response = await fetch('/api/status');
@@ -73,6 +187,33 @@ async function checkStatus() {
     }
 }
 
+function watchStatus() {
+    // The server pushes status changes; poll only where EventSource is missing
+    if (!window.EventSource) {
+        setInterval(checkStatus, 5000);
+        return;
+    }
+    
+    const source = new EventSource('/api/status/stream');
+    source.addEventListener('status', (event) => {
+        const data = JSON.parse(event.data);
+        isInjected = data.injected;
+        updateUI();
+    });
+    
+    // Streams that end are reopened by the browser, but a refused one (the
+    // server is out of stream slots) is not: poll for a while, then retry
+    source.addEventListener('error', () => {
+        if (source.readyState !== EventSource.CLOSED) return;
+        checkStatus();
+        const poll = setInterval(checkStatus, 5000);
+        setTimeout(() => {
+            clearInterval(poll);
+            watchStatus();
+        }, 60000);
+    });
+}
+
 function updateUI() {
     if (isInjected) {
         statusDot.classList.add('active');
@@ -138,7 +279,12 @@ async function executeScript() {
             },
             body: JSON.stringify({ script })
         });
-        const data = await response.json();
+        let data = await response.json();
+        
+        // The script runs as a background job; long-poll until it is done
+        if (data.job_id) {
+            data = await waitForJob(data.job_id);
+        }
         
         if (data.success) {
             showNotification('Success', data.message, 'success');
@@ -153,6 +299,21 @@ async function executeScript() {
     }
 }
 
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}?wait=10`);
+        const data = await response.json();
+        if (!response.ok || data.status === 'done') {
+            return data;
+        }
+        // Set when the server could not hold the request open
+        const retryAfter = parseFloat(response.headers.get('Retry-After'));
+        if (retryAfter > 0) {
+            await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+        }
+    }
+}
+
 async function testScript() {
     const script = scriptEditor.value.trim();
     
@@ -163,20 +324,26 @@ async function testScript() {
     
     testBtn.classList.add('loading');
     testBtn.disabled = true;
+    clearConsole();
     
     try {
-        const response = await fetch('/api/test', {
+        // Console output arrives as Server-Sent Events while the script runs;
+        // the final 'result' event carries the usual /api/test response
+        const response = await fetch('/api/test/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({ script })
         });
-        const data = await response.json();
+        const data = await readTestStream(response);
         
-        if (data.success) {
+        if (!data) {
+            showNotification('Error', 'Test failed: no result from server', 'error');
+        } else if (data.success) {
             showNotification('Test Complete', data.message, 'success', 8000);
         } else {
+            appendConsole(data.message, true);
             showNotification('Test Failed', data.message, 'error', 8000);
         }
     } catch (error) {
@@ -187,12 +354,67 @@ async function testScript() {
     }
 }
 
+async function readTestStream(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Messages are separated by a blank line
+        let end;
+        while ((end = buffer.indexOf('\n\n')) >= 0) {
+            const message = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+            
+            let event = 'message';
+            let payload = '';
+            for (const line of message.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) payload += line.slice(6);
+            }
+            if (!payload) continue;
+            
+            const data = JSON.parse(payload);
+            if (event === 'output') {
+                appendConsole(data);
+            } else if (event === 'result') {
+                result = data;
+            }
+        }
+    }
+    
+    return result;
+}
+
+function appendConsole(text, isError = false) {
+    const line = document.createElement('span');
+    if (isError) line.className = 'console-error';
+    line.textContent = text + '\n';
+    consoleOutput.appendChild(line);
+    
+    // Keep the panel bounded for chatty scripts
+    while (consoleOutput.textContent.length > CONSOLE_LIMIT && consoleOutput.childNodes.length > 1) {
+        consoleOutput.removeChild(consoleOutput.firstChild);
+    }
+    consoleOutput.scrollTop = consoleOutput.scrollHeight;
+}
+
+function clearConsole() {
+    consoleOutput.textContent = '';
+}
+
 function clearEditor() {
     if (scriptEditor.value.trim() && !confirm('Are you sure you want to clear the editor?')) {
         return;
     }
     scriptEditor.value = '';
     updateEditorStats();
+    scheduleValidation();
     showNotification('Info', 'Editor cleared', 'info');
 }
 
@@ -256,6 +478,7 @@ function loadFromFile() {
         reader.onload = (event) => {
             scriptEditor.value = event.target.result;
             updateEditorStats();
+            scheduleValidation();
             showNotification('Success', `Loaded ${file.name}`, 'success');
         };
         
@@ -271,49 +494,116 @@ function loadFromFile() {
 
 async function showScriptHub() {
     hubModal.classList.add('show');
+    hubSearch.value = '';
     scriptsContainer.innerHTML = '<p style="text-align: center; color: #888;">Loading scripts...</p>';
     
     try {
+        // The listing carries names and descriptions only; content is
+        // fetched when a script is loaded
         const response = await fetch('/api/scripts');
-        const scripts = await response.json();
+        const data = await response.json();
         
-        if (Object.keys(scripts).length === 0) {
+        if (data.scripts.length === 0) {
             scriptsContainer.innerHTML = '<p style="text-align: center; color: #888;">No scripts available. Save some scripts to see them here!</p>';
             return;
         }
         
         scriptsContainer.innerHTML = '';
-        
-        for (const [name, data] of Object.entries(scripts)) {
-            const card = document.createElement('div');
-            card.className = 'script-card';
-            
-            card.innerHTML = `
-                <h3>${name}</h3>
-                <p>${data.description || 'No description'}</p>
-                <div class="script-card-buttons">
-                    <button class="btn btn-primary" onclick="loadScript('${name}')">Load Script</button>
-                </div>
-            `;
-            
-            scriptsContainer.appendChild(card);
-        }
+        renderScriptCards(data);
     } catch (error) {
         scriptsContainer.innerHTML = '<p style="text-align: center; color: #e74c3c;">Failed to load scripts</p>';
         console.error('Failed to load scripts:', error);
     }
 }
 
-async function loadScript(name) {
+// Hub search runs on the server; wait for a pause in typing
+let hubSearchTimer = null;
+let hubSearchSeq = 0;
+
+function scheduleHubSearch() {
+    clearTimeout(hubSearchTimer);
+    hubSearchTimer = setTimeout(searchScriptHub, 200);
+}
+
+async function searchScriptHub() {
+    const query = hubSearch.value.trim();
+    if (!query) {
+        hubSearchSeq++;
+        showScriptHub();
+        return;
+    }
+    
+    const seq = ++hubSearchSeq;
     try {
-        const response = await fetch('/api/scripts');
-        const scripts = await response.json();
+        const response = await fetch(`/api/scripts/search?q=${encodeURIComponent(query)}`);
+        const data = await response.json();
+        if (seq !== hubSearchSeq) return;  // A newer search has been sent
         
-        if (scripts[name]) {
-            scriptEditor.value = scripts[name].content;
+        if (data.scripts.length === 0) {
+            scriptsContainer.innerHTML = '<p style="text-align: center; color: #888;">No scripts match your search</p>';
+            return;
+        }
+        scriptsContainer.innerHTML = '';
+        renderScriptCards(data);
+    } catch (error) {
+        if (seq !== hubSearchSeq) return;
+        scriptsContainer.innerHTML = '<p style="text-align: center; color: #e74c3c;">Search failed</p>';
+        console.error('Search failed:', error);
+    }
+}
+
+function renderScriptCards(data) {
+    for (const script of data.scripts) {
+        const card = document.createElement('div');
+        card.className = 'script-card';
+        
+        card.innerHTML = `
+            <h3></h3>
+            <p></p>
+            <div class="script-card-buttons">
+                <button class="btn btn-primary">Load Script</button>
+            </div>
+        `;
+        card.querySelector('h3').textContent = script.name;
+        card.querySelector('p').textContent = script.description || 'No description';
+        card.querySelector('button').addEventListener('click', () => loadScript(script.id));
+        
+        scriptsContainer.appendChild(card);
+    }
+    
+    if (data.next_cursor) {
+        const more = document.createElement('button');
+        more.className = 'btn btn-secondary load-more-btn';
+        more.textContent = 'Load more';
+        more.addEventListener('click', async () => {
+            more.disabled = true;
+            try {
+                const response = await fetch(`/api/scripts?cursor=${encodeURIComponent(data.next_cursor)}`);
+                const next = await response.json();
+                more.remove();
+                renderScriptCards(next);
+            } catch (error) {
+                more.disabled = false;
+                showNotification('Error', 'Failed to load more scripts', 'error');
+            }
+        });
+        scriptsContainer.appendChild(more);
+    }
+}
+
+async function loadScript(id) {
+    try {
+        const response = await fetch(`/api/scripts/${encodeURIComponent(id)}`);
+        const script = await response.json();
+        
+        if (response.ok) {
+            scriptEditor.value = script.content;
             updateEditorStats();
+            scheduleValidation();
             hideModal(hubModal);
-            showNotification('Success', `Loaded ${name}`, 'success');
+            showNotification('Success', `Loaded ${script.name}`, 'success');
+        } else {
+            showNotification('Error', script.message || 'Failed to load script', 'error');
         }
     } catch (error) {
         showNotification('Error', 'Failed to load script', 'error');
@@ -376,6 +666,3 @@ document.addEventListener('keydown', (e) => {
         loadFromFile();
     }
 });
-
-// Check status periodically
-setInterval(checkStatus, 5000);
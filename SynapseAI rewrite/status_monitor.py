@@ -0,0 +1,95 @@
+"""
+Shared injection/process status for every open tab.
+
+One background thread samples RobloxExecutor status and publishes it only
+when it changes; /api/status serves the cached copy and /api/status/stream
+pushes changes as Server-Sent Events. The cost of watching Roblox is the
+same no matter how many tabs are open.
+"""
+
+import threading
+import time
+
+import config
+
+
+class StatusMonitor:
+    """Samples executor status on an interval and broadcasts changes.
+
+    interval -- seconds between samples
+    """
+
+    def __init__(self, executor, interval=None):
+        self.executor = executor
+        self.interval = interval or config.STATUS_INTERVAL
+        self.state = None
+        self.version = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._stats = {'samples': 0, 'changes': 0}
+
+    def start(self):
+        """Start the sampling thread (done lazily on first use)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._sample()
+            threading.Thread(target=self._run, name="synapse-status", daemon=True).start()
+            self._started = True
+
+    def refresh(self):
+        """Sample again right away, e.g. after an injection."""
+        self._wake.set()
+
+    def current(self):
+        """Return the latest status without touching the process."""
+        self.start()
+        return self.state
+
+    def subscribe(self, keepalive=None):
+        """Yield the current status, then each new one as it changes.
+
+        Yields None after keepalive seconds without a change, so the caller
+        can write something and notice clients that went away.
+        """
+        self.start()
+        keepalive = keepalive or config.STATUS_KEEPALIVE
+        with self._cond:
+            version, state = self.version, self.state
+        yield state
+        while True:
+            with self._cond:
+                changed = self._cond.wait_for(lambda: self.version != version, keepalive)
+                version, state = self.version, self.state
+            yield state if changed else None
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._sample()
+
+    def _sample(self):
+        injected = self.executor.is_injected()
+        info = self.executor.get_roblox_info() if injected else None
+        if info:
+            # Memory moves a little on every sample; whole megabytes are
+            # enough for the UI and keep unchanged states from broadcasting
+            info['memory'] = round(info['memory'])
+        state = {'injected': injected, 'info': info}
+
+        with self._cond:
+            self._stats['samples'] += 1
+            if state != self.state:
+                self.state = state
+                self.version += 1
+                self._stats['changes'] += 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+        stats['interval'] = self.interval
+        return stats
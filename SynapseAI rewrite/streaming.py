@@ -0,0 +1,91 @@
+"""
+Server-Sent Events helpers for streaming responses from Flask.
+"""
+
+import json
+import queue
+import threading
+
+
+def format_sse(data, event=None):
+    """Encode one SSE message; data is sent as JSON on a single line."""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+def stream_call(func):
+    """Run func(emit) on a background thread and yield its events as SSE.
+
+    Every emit(chunk) becomes an 'output' event (chunks queued while the
+    client was being written to are merged into one event), and func's
+    return value is sent last as a 'result' event.
+    """
+    events = queue.Queue()
+
+    def run():
+        try:
+            result = func(lambda chunk: events.put(('output', chunk)))
+        except Exception as e:
+            result = {'success': False, 'message': f"Error: {e}"}
+        events.put(('result', result))
+
+    threading.Thread(target=run, name="synapse-stream", daemon=True).start()
+
+    while True:
+        event, data = events.get()
+        if event == 'output':
+            chunks = [data]
+            while True:
+                try:
+                    event, data = events.get_nowait()
+                except queue.Empty:
+                    event = None
+                    break
+                if event != 'output':
+                    break
+                chunks.append(data)
+            yield format_sse('\n'.join(chunks), 'output')
+            if event is None:
+                continue
+        yield format_sse(data, event)
+        if event == 'result':
+            return
+
+
+class StreamSlots:
+    """Caps responses that hold a server thread while they wait for news.
+
+    Under --serve every open status stream or job long-poll occupies one of
+    a fixed number of worker threads, so past the limit they are refused
+    (streams) or answered at once (long-polls) instead.
+
+    limit -- concurrent holders allowed; None for no limit
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+        self._stats = {'granted': 0, 'refused': 0}
+
+    def acquire(self):
+        """Take a slot if one is free; returns whether it did."""
+        with self._lock:
+            if self.limit is not None and self.active >= self.limit:
+                self._stats['refused'] += 1
+                return False
+            self.active += 1
+            self._stats['granted'] += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'active': self.active, 'limit': self.limit})
+        return stats
@@ -0,0 +1,128 @@
+"""
+Per-editor-session state for as-you-type validation (/api/validate).
+
+Each browser tab keeps a session id and sends the line ranges it changed.
+The server applies them to a cached LuaDocument, so only the edited lines
+are re-lexed before the heuristic checks and (when those pass) the cached
+Lua compile step of RobloxExecutor.validate_lua_syntax run.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from lua_lexer import LuaDocument
+
+_ERROR_LINE_RE = re.compile(r'^Line (\d+): (.*)$')
+
+
+class ResyncRequired(Exception):
+    """The client's view of the document no longer matches the server's."""
+
+
+class _Session:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.document = None
+        self.version = None
+        self.last_used = time.monotonic()
+
+
+class ValidationSessions:
+    """Bounded store of incremental validation documents, one per session."""
+
+    def __init__(self, executor, max_sessions=None, idle_timeout=None):
+        self.executor = executor
+        self.max_sessions = max_sessions or config.VALIDATION_SESSIONS_MAX
+        self.idle_timeout = idle_timeout or config.VALIDATION_SESSION_TTL
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_session(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session()
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+
+            # Drop the least recently used sessions beyond the limit and any
+            # that went idle (closed tabs never say goodbye)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            for stale_id, stale in list(self._sessions.items()):
+                if now - stale.last_used <= self.idle_timeout:
+                    break
+                del self._sessions[stale_id]
+
+            return session
+
+    def validate(self, session_id, version, text=None, edits=None, base_version=None):
+        """Apply a full text or a list of line edits, then validate.
+
+        edits is a list of {'start', 'end', 'lines'} dicts replacing the
+        0-based line range [start, end). Raises ValueError when text is not
+        a string, and ResyncRequired when edits are malformed or do not apply
+        to the version the server holds.
+        """
+        if text is not None and not isinstance(text, str):
+            raise ValueError("text must be a string")
+        session = self._get_session(session_id)
+        with session.lock:
+            started = time.perf_counter()
+            relexed = 0
+            if text is not None:
+                session.document = LuaDocument(text)
+                relexed = len(session.document.lines)
+            else:
+                if session.document is None or session.version != base_version:
+                    raise ResyncRequired("Session state is out of date")
+                try:
+                    if not isinstance(edits or [], list):
+                        raise TypeError("edits must be a list")
+                    for edit in edits or []:
+                        lines = edit['lines']
+                        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+                            raise TypeError("lines must be a list of strings")
+                        relexed += session.document.replace_lines(int(edit['start']), int(edit['end']), lines)
+                except (KeyError, TypeError, ValueError) as e:
+                    # Half-applied edits leave the document unusable
+                    session.document = None
+                    raise ResyncRequired(f"Invalid edit: {e}")
+            session.version = version
+
+            document = session.document
+            heuristic_errors = document.errors()
+            script = document.text
+            if script.strip():
+                valid, message = self.executor.validate_lua_syntax(script, heuristic_errors)
+            else:
+                valid, message = True, "Script is empty"
+
+            return {
+                'valid': valid,
+                'message': message,
+                'errors': [] if valid else _split_errors(message),
+                'version': version,
+                'relexed_lines': relexed,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+            }
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'max_sessions': self.max_sessions}
+
+
+def _split_errors(message):
+    """Turn "Line N: ..." lines into [{'line': N, 'message': ...}]."""
+    errors = []
+    for text in message.split('\n'):
+        match = _ERROR_LINE_RE.match(text)
+        if match:
+            errors.append({'line': int(match.group(1)), 'message': match.group(2)})
+        elif text:
+            errors.append({'line': None, 'message': text})
+    return errors